@@ -1,71 +1,376 @@
-import pandas as pd
-import random
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+
 import numpy as np
+import pandas as pd
+
+from DatasetCreator import pa, pa_csv, pq, write_chunks
 
 data_path = r'C:\week3_assignment\Synthetic_Banking_Customer_Dataset.csv'
-df = pd.read_csv(data_path)
+updated_file_path = r'C:\week3_assignment\Synthetic_Banking_Customer_Dataset_1.csv'
 
+DEFAULT_CHUNK_ROWS = 1_000_000
+# Rough size of one input CSV row, to turn a chunk size in rows into an Arrow block size
+CSV_BYTES_PER_ROW = 300
 
-df['LoanStatus'] = ''
-df['Reason'] = ''
-df['empSal'] = df['Asset Value'] * 0.024  # 2.4% of Asset Value
-df['EMI Amount'] = (((df['Loan Amount Requested'] * ((df['Rate of Interest (%)'] / 100)*df['Actual Loan Tenure (Years)']))+df['Loan Amount Requested'])/(df['Actual Loan Tenure (Years)']*12))
-# df['EMI Amount'] = ((df['Loan Amount Requested'] * df['Rate of Interest (%)'] / 100))/df["Actual Loan Tenure (Years)"] * 12
+# Input columns read as numbers; every other column passes through as text
+INTEGER_COLUMNS = ["Credit Score", "Loan Amount Requested"]
+FLOAT_COLUMNS = [
+    "Asset Value", "Loan Amount Sanctioned", "Disbursed Amount", "Rate of Interest (%)",
+    "Actual Loan Tenure (Years)", "Paid Tenure (Years)", "Remaining Tenure (Years)", "Late Repayments"
+]
 
+LOAN_STATUSES = ["Denied", "Cancelled", "Approved"]
+DTI_REASONS = ['Insufficient Income', 'High Debt-to-Income Ratio (DTI)']
+CANCEL_REASONS = ['Customer not continuing', 'Cancellation against Bank policy', 'Technical Issue cancellation']
+REASONS = DTI_REASONS + CANCEL_REASONS + ['Documents Missing', 'Poor credit score', 'Employment instability']
 
-df['Employed Company'] = [random.randint(1, 4) for _ in range(len(df))]
+CANCELLED_COLUMNS = [
+    'Loan Amount Sanctioned', 'Disbursed Amount', 'Rate of Interest (%)',
+    'Loan Insurance Taken', 'Approval Date', 'Actual Loan Tenure (Years)',
+    'Paid Tenure (Years)', 'Remaining Tenure (Years)', 'Late Repayments'
+]
+MISSING_DOCUMENT_COLUMNS = [
+    'Proof of Identity', 'Loan Amount Sanctioned', 'Disbursed Amount', 'Rate of Interest (%)',
+    'Loan Insurance Taken', 'Approval Date', 'KYC Document', 'Income Proof'
+]
 
 
+def numeric(chunk, col):
+    return pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
 
-dti_condition = (
-    (df['Loan Amount Requested'] < df['Asset Value'] * 0.5) &
-    (df['EMI Amount'] < (df['empSal'])* 0.25)
-)
-df.loc[dti_condition, 'LoanStatus'] = 'Denied'
-df.loc[dti_condition, 'Reason'] = [random.choice([
-    'Insufficient Income', 'High Debt-to-Income Ratio (DTI)']) for _ in range(dti_condition.sum())]
+def employment_years(column):
+    """
+    Read the number of years out of 'Employment History' values such as "12 years".
 
+    The regex runs once per distinct value instead of once per row.
+    """
+    values = column.astype('category')
+    years = values.cat.categories.str.extract(r'(\d+)', expand=False).astype(float).to_numpy()
+    codes = values.cat.codes.to_numpy()
+    return np.where(codes >= 0, years[codes], np.nan)
 
-cancel_indices = random.sample(range(len(df)), int(len(df) * 0.1)) 
-df.loc[cancel_indices, 'LoanStatus'] = 'Cancelled'
-df.loc[cancel_indices, [
-    'Loan Amount Sanctioned', 'Disbursed Amount', 'Rate of Interest (%)',
-    'Loan Insurance Taken', 'Approval Date', 'Actual Loan Tenure (Years)',
-    'Paid Tenure (Years)', 'Remaining Tenure (Years)', 'Late Repayments'
-]] = np.nan
-df.loc[cancel_indices, 'Reason'] = [random.choice([
-    'Customer not continuing', 'Cancellation against Bank policy', 'Technical Issue cancellation'])
-    for _ in range(len(cancel_indices))]
+def sample_rows(rng, rows, share):
+    """
+    Mark each row independently with probability share.
 
+    A fixed int(rows * share) per chunk would mark nothing in the small deltas of
+    incremental runs, so the share must not depend on the chunk size.
+    """
+    return rng.random(rows) < share
 
-missing_doc_indices = random.sample(range(len(df)), int(len(df) * 0.1)) 
-df.loc[missing_doc_indices, ['Proof of Identity']] = np.nan
-df.loc[missing_doc_indices, [
-    'Loan Amount Sanctioned', 'Disbursed Amount', 'Rate of Interest (%)',
-    'Loan Insurance Taken', 'Approval Date', 'KYC Document', 'Income Proof'
-]] = np.nan
-df.loc[missing_doc_indices, 'LoanStatus'] = 'Denied'
-df.loc[missing_doc_indices, 'Reason'] = 'Documents Missing'
+def label_chunk(df, rng):
+    """
+    Add LoanStatus, Reason, empSal, EMI Amount and Employed Company to a chunk of rows.
 
+    The rules run in order, each overriding the ones before it: DTI, 10% cancellations,
+    10% missing documents, poor credit score, employment instability, and approval for
+    every row left unlabelled. Every random draw comes from rng.
 
-poor_credit_condition = (df['Credit Score'] >= 300) & (df['Credit Score'] <= 650)
-df.loc[poor_credit_condition, 'LoanStatus'] = 'Denied'
-df.loc[poor_credit_condition, 'Reason'] = 'Poor credit score'
+    Args:
+        df (pd.DataFrame): Rows with the columns DatasetCreator.py writes.
+        rng (np.random.Generator): The seeded generator to draw from.
 
+    Returns:
+        pd.DataFrame: The labelled rows.
+    """
+    rows = len(df)
+    asset_value = numeric(df, 'Asset Value')
+    loan_requested = numeric(df, 'Loan Amount Requested')
+    rate = numeric(df, 'Rate of Interest (%)')
+    tenure = numeric(df, 'Actual Loan Tenure (Years)')
+    credit_score = numeric(df, 'Credit Score')
 
-employment_instability_condition = (
-    df['Employment History'].str.extract(r'(\d+)').astype(float)[0] / df['Employed Company'] < 2
-)
-df.loc[employment_instability_condition, 'LoanStatus'] = 'Denied'
-df.loc[employment_instability_condition, 'Reason'] = 'Employment instability'
+    emp_sal = asset_value * 0.024  # 2.4% of Asset Value
+    emi_amount = ((loan_requested * ((rate / 100) * tenure)) + loan_requested) / (tenure * 12)
+    employed_company = rng.integers(1, 5, rows)
 
+    # Codes into LOAN_STATUSES and REASONS; -1 means not set
+    status = np.full(rows, -1, dtype=np.int8)
+    reason = np.full(rows, -1, dtype=np.int8)
 
-remaining_condition = df['LoanStatus'] == ''
-df.loc[remaining_condition, 'LoanStatus'] = 'Approved'
-df.loc[remaining_condition, 'Reason'] = np.nan
+    dti_condition = (loan_requested < asset_value * 0.5) & (emi_amount < emp_sal * 0.25)
+    status[dti_condition] = LOAN_STATUSES.index('Denied')
+    reason[dti_condition] = rng.integers(0, len(DTI_REASONS), int(dti_condition.sum()))
 
+    cancelled = sample_rows(rng, rows, 0.1)
+    status[cancelled] = LOAN_STATUSES.index('Cancelled')
+    reason[cancelled] = len(DTI_REASONS) + rng.integers(0, len(CANCEL_REASONS), int(cancelled.sum()))
 
-updated_file_path = r'C:\week3_assignment\Synthetic_Banking_Customer_Dataset_1.csv'
-df.to_csv(updated_file_path, index=False)
+    missing_documents = sample_rows(rng, rows, 0.1)
+    status[missing_documents] = LOAN_STATUSES.index('Denied')
+    reason[missing_documents] = REASONS.index('Documents Missing')
+
+    poor_credit_condition = (credit_score >= 300) & (credit_score <= 650)
+    status[poor_credit_condition] = LOAN_STATUSES.index('Denied')
+    reason[poor_credit_condition] = REASONS.index('Poor credit score')
+
+    employment_instability_condition = employment_years(df['Employment History']) / employed_company < 2
+    status[employment_instability_condition] = LOAN_STATUSES.index('Denied')
+    reason[employment_instability_condition] = REASONS.index('Employment instability')
+
+    remaining_condition = status == -1
+    status[remaining_condition] = LOAN_STATUSES.index('Approved')
+    reason[remaining_condition] = -1
+
+    df = df.copy()
+    for col in CANCELLED_COLUMNS:
+        df[col] = df[col].mask(cancelled)
+    for col in MISSING_DOCUMENT_COLUMNS:
+        df[col] = df[col].mask(missing_documents)
+
+    df['LoanStatus'] = pd.Categorical.from_codes(status, categories=LOAN_STATUSES)
+    df['Reason'] = pd.Categorical.from_codes(reason, categories=REASONS)
+    df['empSal'] = emp_sal
+    df['EMI Amount'] = emi_amount
+    df['Employed Company'] = employed_company
+    return df
+
+##############################################################################################
+
+def read_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Read a dataset file in chunks, so files larger than memory can be labelled.
+
+    CSV is streamed with pyarrow's reader when it is installed, in blocks of about
+    chunk_rows rows, and with pandas otherwise. Parquet files (pyarrow only) are read
+    chunk_rows rows at a time.
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of the file.
+    """
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("Reading parquet needs pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+
+    with open(path, newline="", encoding="utf-8") as input_file:
+        header = next(csv.reader(input_file))
+    yield from read_csv_chunks(path, header, chunk_rows)
+
+def read_csv_chunks(source, header, chunk_rows):
+    """
+    Read CSV chunks from a path or binary file object whose columns are header.
+    """
+    if pa_csv is None:
+        dtypes = {col: str for col in header if col not in INTEGER_COLUMNS + FLOAT_COLUMNS}
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype=dtypes)
+        return
+
+    column_types = {
+        col: pa.int64() if col in INTEGER_COLUMNS else pa.float64() if col in FLOAT_COLUMNS else pa.string()
+        for col in header
+    }
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=chunk_rows * CSV_BYTES_PER_ROW),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+def alter_dataset(input_path, output_path, seed=None, chunk_rows=DEFAULT_CHUNK_ROWS, file_format="csv"):
+    """
+    Label a dataset file chunk by chunk and write the result, keeping one chunk in memory.
+
+    The output is reproducible for a given seed and chunk size.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    chunks = (label_chunk(chunk, rng) for chunk in read_chunks(input_path, chunk_rows))
+    return write_chunks(chunks, output_path, file_format)
+
+##############################################################################################
+# Incremental labelling: only the rows appended to the input CSV since the last run.
+
+# Bytes just before the high-water mark, hashed to notice an input rewritten in place
+FINGERPRINT_BYTES = 4096
+
+
+class CsvTail(io.RawIOBase):
+    """
+    A CSV file read as its header line followed by bytes [start, end) of the file.
+    """
+
+    def __init__(self, path, header_bytes, start, end):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._header = header_bytes
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._header:
+            size = min(len(buffer), len(self._header))
+            buffer[:size] = self._header[:size]
+            self._header = self._header[size:]
+            return size
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def state_path(output_path):
+    return output_path + ".state.json"
+
+def load_state(output_path):
+    try:
+        with open(state_path(output_path)) as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return None
+
+def save_state(output_path, state):
+    partial_path = state_path(output_path) + ".partial"
+    with open(partial_path, "w") as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(partial_path, state_path(output_path))
+
+def input_fingerprint(path, offset):
+    with open(path, "rb") as input_file:
+        input_file.seek(max(0, offset - FINGERPRINT_BYTES))
+        return hashlib.sha1(input_file.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+def complete_lines_end(path, size):
+    """
+    Return the offset just past the last newline before size, so a row that is still
+    being appended to the input is left for the next run.
+    """
+    with open(path, "rb") as input_file:
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            input_file.seek(start)
+            block = input_file.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return 0
+
+def resume_point(state, input_path, header_bytes, end, output_path):
+    """
+    Check that the last run's state still describes the input and the output.
+
+    Returns:
+        Optional[str]: Why everything has to be labelled again, or None to resume.
+    """
+    if state is None:
+        return "no earlier run"
+    if state.get("input") != os.path.abspath(input_path) or state.get("header") != header_bytes.decode("utf-8"):
+        return "the input file or its columns changed"
+    if state["offset"] > end or state["fingerprint"] != input_fingerprint(input_path, state["offset"]):
+        return "rows already labelled were rewritten"
+    if not os.path.exists(output_path):
+        return "the output is missing"
+    return None
+
+def alter_incremental(input_path, output_path, seed=None, chunk_rows=DEFAULT_CHUNK_ROWS, file_format="csv",
+                      partitioned=False):
+    """
+    Label only the rows appended to the input CSV since the last run.
+
+    A state file next to the output (<output>.state.json) keeps the byte offset up to
+    which the input has been labelled. New rows are appended to the output CSV or, with
+    partitioned, written to a new part-NNNNN file in the output directory, so rows
+    labelled earlier are never rewritten. If the input no longer starts with the rows
+    that were labelled, everything is labelled again from scratch.
+
+    Each run draws from its own stream, seeded with (seed, run number).
+
+    Args:
+        input_path (str): The CSV written by DatasetCreator.py, possibly grown since the last run.
+        output_path (str): The labelled CSV, or a directory of parts if partitioned.
+        seed (int, optional): Seed for reproducible labels.
+        chunk_rows (int): Rows labelled at a time.
+        file_format (str): "csv", or "parquet" when partitioned.
+        partitioned (bool): Write each run's rows as a new file in the output directory.
+
+    Returns:
+        int: The number of rows labelled by this run.
+    """
+    if input_path.endswith(".parquet"):
+        raise ValueError("Incremental labelling needs a CSV input")
+    if file_format != "csv" and not partitioned:
+        raise ValueError("Only CSV output can be appended to; use partitioned output for parquet")
+
+    with open(input_path, "rb") as input_file:
+        header_bytes = input_file.readline()
+    header = next(csv.reader([header_bytes.decode("utf-8")]))
+    end = complete_lines_end(input_path, os.path.getsize(input_path))
+
+    state = load_state(output_path)
+    restart_reason = resume_point(state, input_path, header_bytes, end, output_path)
+    if restart_reason is None:
+        start, run, total_rows = state["offset"], state["runs"], state["rows"]
+        if not partitioned and os.path.getsize(output_path) != state["outputBytes"]:
+            # Drop rows an interrupted run appended after its state was saved
+            with open(output_path, "r+b") as output_file:
+                output_file.truncate(state["outputBytes"])
+    else:
+        print(f"Labelling every row: {restart_reason}")
+        start, run, total_rows = len(header_bytes), 0, 0
+        if partitioned:
+            os.makedirs(output_path, exist_ok=True)
+            for old_part in glob.glob(os.path.join(output_path, "part-*")):
+                os.remove(old_part)
+
+    if start >= end:
+        print(f"No new rows since the last run ({total_rows:,} rows labelled)")
+        return 0
+
+    rng = np.random.default_rng(None if seed is None else [seed, run])
+    with io.BufferedReader(CsvTail(input_path, header_bytes, start, end)) as delta:
+        chunks = (label_chunk(chunk, rng) for chunk in read_csv_chunks(delta, header, chunk_rows))
+        if partitioned:
+            written = write_chunks(chunks, os.path.join(output_path, f"part-{run:05d}.{file_format}"), file_format)
+        else:
+            written = write_chunks(chunks, output_path, file_format, append=start > len(header_bytes))
+
+    save_state(output_path, {
+        "input": os.path.abspath(input_path),
+        "header": header_bytes.decode("utf-8"),
+        "offset": end,
+        "fingerprint": input_fingerprint(input_path, end),
+        "rows": total_rows + written,
+        "runs": run + 1,
+        "outputBytes": None if partitioned else os.path.getsize(output_path)
+    })
+    print(f"Labelled {written:,} new rows ({total_rows + written:,} in total)")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add loan status labels to the synthetic banking dataset.")
+    parser.add_argument("--input", default=data_path, help="CSV or parquet written by DatasetCreator.py")
+    parser.add_argument("--output", default=updated_file_path)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible labels")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows labelled at a time")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Label only the rows appended to the input since the last run")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="With --incremental, write each run's rows as a new part file in the --output directory")
+    args = parser.parse_args()
 
-print(f"Updated dataset saved to {updated_file_path}")
+    if args.incremental:
+        alter_incremental(args.input, args.output, args.seed, args.chunk_rows, args.format, args.partitioned)
+    else:
+        alter_dataset(args.input, args.output, args.seed, args.chunk_rows, args.format)
+    print(f"Updated dataset saved to {args.output}")
@@ -1,6 +1,20 @@
-import pandas as pd
+import argparse
+import os
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import permutations
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_csv = pq = None
 
 # Define parameters for customer-centric data
 customer_names = [
@@ -55,11 +69,11 @@ branch_manager_mapping = {
     "Madurai": "Aarohi", "Patna": "Nandini"
 }
 
-# Function to generate credit scores with specified distribution
+# Function to generate credit scores with specified distribution: 5% from 300-649, 95% from 651-849
 def generate_credit_score():
-    low_score = random.choices(range(300, 650), k=int(0.05 * 3000))
-    high_score = random.choices(range(651, 850), k=int(0.95 * 3000))
-    return random.choice(low_score + high_score)
+    if random.random() < 0.05:
+        return random.randint(300, 649)
+    return random.randint(651, 849)
 
 # Generate requested and approval dates within 2022 to 2024
 def generate_requested_and_approval_dates():
@@ -67,91 +81,6 @@ def generate_requested_and_approval_dates():
     approval_date = requested_date + timedelta(days=random.randint(1, 30))
     return requested_date, approval_date
 
-# Initialize synthetic data
-synthetic_data = []
-
-for _ in range(3000):  # Generate 3000 customer records
-    customer_id = f"CUST-{random.randint(1000, 9999)}"
-    customer_name = random.choice(customer_names)
-    credit_score = generate_credit_score()
-    employment_history = f"{random.randint(1, 20)} years"
-    branch = random.choice(additional_branches)
-    region = random.choice(regions)
-    manager_name = branch_manager_mapping[branch]  # Get the manager for the branch
-    loan_type = random.choice(loan_types)
-    asset_type = asset_types[loan_type]
-    asset_value = random.randint(500_000, 5_000_000) if asset_type != "No Asset" else "N/A"
-    loan_requested = (
-        int(asset_value * 0.5) if asset_type != "No Asset" else random.randint(50_000, 500_000)
-    )
-    loan_sanctioned = int(loan_requested * random.uniform(0.8, 0.95))
-    loan_disbursed = int(loan_sanctioned * random.uniform(0.9, 0.98))
-    actual_tenure = random.randint(10, 20)
-    rate_of_interest = round(random.uniform(7, 14), 2)
-    late_repayments = random.randint(0, 20)
-    loan_insurance = random.choice(["Yes", "No"])
-    kyc_doc = random.choice(kyc_documents)
-    proof_id = ", ".join(random.sample(proof_of_identity, 2))
-    income_proof = ", ".join(random.sample(income_proofs, 3))
-
-    # Determine process status
-    process_status = random.choices(list(status_distribution.keys()), weights=list(status_distribution.values()), k=1)[0]
-    requested_date, approval_date = generate_requested_and_approval_dates()
-    paid_tenure = None
-
-    if process_status == "Disbursed":
-        time_diff = datetime(2023, 12, 20) - approval_date
-        paid_tenure = round(time_diff.days / 365, 1)
-    elif process_status == "Work in Progress":
-        paid_tenure = "N/A"
-
-    # Calculate remaining tenure
-    if paid_tenure is not None and paid_tenure != "N/A":
-        remaining_tenure = actual_tenure - paid_tenure
-    else:
-        remaining_tenure = "N/A"
-
-    # Adjust values for "Work in Progress"
-    if process_status == "Work in Progress":
-        loan_sanctioned = loan_requested
-        loan_disbursed = "N/A"
-    
-    # Generate query type for "Work in Progress"
-    query_type = None
-    if process_status == "Work in Progress":
-        query_type = random.choice(["Operational Cases", "Credit Cases", "Sales Queries"])
-
-    synthetic_data.append({
-        "Customer ID": customer_id,
-        "Customer Name": customer_name,
-        "Credit Score": credit_score,
-        "Employment History": employment_history,
-        "Branch": branch + "-" + region,  # Add the region to form the full branch name
-        "Manager Name": manager_name,  # Use the consistent branch manager
-        "Loan Type": loan_type,
-        "Submitted Asset Type": asset_type,
-        "Asset Value": asset_value,
-        "Loan Amount Requested": loan_requested,
-        "Loan Amount Sanctioned": loan_sanctioned,
-        "Disbursed Amount": loan_disbursed if process_status == "Disbursed" else "N/A",
-        "Rate of Interest (%)": rate_of_interest,
-        "Loan Insurance Taken": loan_insurance,
-        "Process Status": process_status,
-        "Query Type (Only WIP)": query_type,
-        "Requested Date": requested_date.strftime('%Y-%m-%d'),
-        "Approval Date": approval_date.strftime('%Y-%m-%d'),
-        "Actual Loan Tenure (Years)": actual_tenure,
-        "Paid Tenure (Years)": paid_tenure,
-        "Remaining Tenure (Years)": remaining_tenure,
-        "Late Repayments": late_repayments,
-        "KYC Document": kyc_doc,
-        "Proof of Identity": proof_id,
-        "Income Proof": income_proof
-    })
-
-# Create a DataFrame
-df_synthetic = pd.DataFrame(synthetic_data)
-
 # Rearrange columns for better readability
 column_order = [
     "Customer ID", "Customer Name", "Credit Score", "Employment History",
@@ -161,13 +90,456 @@ column_order = [
     "Actual Loan Tenure (Years)", "Paid Tenure (Years)", "Remaining Tenure (Years)", "Late Repayments",
     "KYC Document", "Proof of Identity", "Income Proof"
 ]
-df_synthetic = df_synthetic[column_order]
 
-# Save to CSV
-file_path_adjusted = "Synthetic_Banking_Customer_Dataset.csv"
-df_synthetic.to_csv(file_path_adjusted, index=False)
+def generate_dataset_loop(rows):
+    """
+    Generate the dataset one row at a time with the random module.
+
+    Args:
+        rows (int): Number of customer records to generate.
+
+    Returns:
+        pd.DataFrame: The generated records in column_order.
+    """
+    # Initialize synthetic data
+    synthetic_data = []
+
+    for _ in range(rows):
+        customer_id = f"CUST-{random.randint(1000, 9999)}"
+        customer_name = random.choice(customer_names)
+        credit_score = generate_credit_score()
+        employment_history = f"{random.randint(1, 20)} years"
+        branch = random.choice(additional_branches)
+        region = random.choice(regions)
+        manager_name = branch_manager_mapping[branch]  # Get the manager for the branch
+        loan_type = random.choice(loan_types)
+        asset_type = asset_types[loan_type]
+        asset_value = random.randint(500_000, 5_000_000) if asset_type != "No Asset" else "N/A"
+        loan_requested = (
+            int(asset_value * 0.5) if asset_type != "No Asset" else random.randint(50_000, 500_000)
+        )
+        loan_sanctioned = int(loan_requested * random.uniform(0.8, 0.95))
+        loan_disbursed = int(loan_sanctioned * random.uniform(0.9, 0.98))
+        actual_tenure = random.randint(10, 20)
+        rate_of_interest = round(random.uniform(7, 14), 2)
+        late_repayments = random.randint(0, 20)
+        loan_insurance = random.choice(["Yes", "No"])
+        kyc_doc = random.choice(kyc_documents)
+        proof_id = ", ".join(random.sample(proof_of_identity, 2))
+        income_proof = ", ".join(random.sample(income_proofs, 3))
+
+        # Determine process status
+        process_status = random.choices(list(status_distribution.keys()), weights=list(status_distribution.values()), k=1)[0]
+        requested_date, approval_date = generate_requested_and_approval_dates()
+        paid_tenure = None
+
+        if process_status == "Disbursed":
+            time_diff = datetime(2023, 12, 20) - approval_date
+            paid_tenure = round(time_diff.days / 365, 1)
+        elif process_status == "Work in Progress":
+            paid_tenure = "N/A"
+
+        # Calculate remaining tenure
+        if paid_tenure is not None and paid_tenure != "N/A":
+            remaining_tenure = actual_tenure - paid_tenure
+        else:
+            remaining_tenure = "N/A"
+
+        # Adjust values for "Work in Progress"
+        if process_status == "Work in Progress":
+            loan_sanctioned = loan_requested
+            loan_disbursed = "N/A"
+        
+        # Generate query type for "Work in Progress"
+        query_type = None
+        if process_status == "Work in Progress":
+            query_type = random.choice(["Operational Cases", "Credit Cases", "Sales Queries"])
+
+        synthetic_data.append({
+            "Customer ID": customer_id,
+            "Customer Name": customer_name,
+            "Credit Score": credit_score,
+            "Employment History": employment_history,
+            "Branch": branch + "-" + region,  # Add the region to form the full branch name
+            "Manager Name": manager_name,  # Use the consistent branch manager
+            "Loan Type": loan_type,
+            "Submitted Asset Type": asset_type,
+            "Asset Value": asset_value,
+            "Loan Amount Requested": loan_requested,
+            "Loan Amount Sanctioned": loan_sanctioned,
+            "Disbursed Amount": loan_disbursed if process_status == "Disbursed" else "N/A",
+            "Rate of Interest (%)": rate_of_interest,
+            "Loan Insurance Taken": loan_insurance,
+            "Process Status": process_status,
+            "Query Type (Only WIP)": query_type,
+            "Requested Date": requested_date.strftime('%Y-%m-%d'),
+            "Approval Date": approval_date.strftime('%Y-%m-%d'),
+            "Actual Loan Tenure (Years)": actual_tenure,
+            "Paid Tenure (Years)": paid_tenure,
+            "Remaining Tenure (Years)": remaining_tenure,
+            "Late Repayments": late_repayments,
+            "KYC Document": kyc_doc,
+            "Proof of Identity": proof_id,
+            "Income Proof": income_proof
+        })
+
+    # Create a DataFrame
+    return pd.DataFrame(synthetic_data)[column_order]
+
+##############################################################################################
+# Vectorized generation: every column drawn at once from a seeded numpy Generator.
+
+def categorical(codes, categories):
+    """
+    Wrap integer codes as a categorical, so no Python string is built per row.
+    """
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def with_missing(values, missing):
+    """
+    Return integer values as a nullable integer column, empty where missing is True.
+    """
+    return pd.arrays.IntegerArray(values.astype(np.int64), missing)
+
+def generate_dataset(rows, rng):
+    """
+    Generate the dataset with every column drawn at once, with the distributions and
+    rules of generate_dataset_loop(): the status weights, the branch->manager and
+    loan->asset mappings, and the Work in Progress rules.
+
+    "N/A" placeholders are left empty; pandas reads both as missing values.
+
+    Args:
+        rows (int): Number of customer records to generate.
+        rng (np.random.Generator): The seeded generator to draw from.
+
+    Returns:
+        pd.DataFrame: The generated records in column_order.
+    """
+    managers = sorted(set(branch_manager_mapping.values()))
+    statuses = list(status_distribution)
+    query_types = ["Operational Cases", "Credit Cases", "Sales Queries"]
+    # random.sample picks an ordered selection, so every permutation is equally likely
+    identity_choices = [", ".join(p) for p in permutations(proof_of_identity, 2)]
+    income_choices = [", ".join(p) for p in permutations(income_proofs, 3)]
+
+    branch = rng.integers(0, len(additional_branches), rows)
+    region = rng.integers(0, len(regions), rows)
+    loan_type = rng.integers(0, len(loan_types), rows)
+    status = rng.choice(len(statuses), size=rows, p=list(status_distribution.values()))
+    work_in_progress = status == statuses.index("Work in Progress")
+    disbursed = status == statuses.index("Disbursed")
+    no_asset = np.array([asset_types[loan] == "No Asset" for loan in loan_types])[loan_type]
+
+    asset_value = rng.integers(500_000, 5_000_001, rows)
+    loan_requested = np.where(no_asset, rng.integers(50_000, 500_001, rows), asset_value // 2)
+    loan_sanctioned = (loan_requested * rng.uniform(0.8, 0.95, rows)).astype(np.int64)
+    loan_disbursed = (loan_sanctioned * rng.uniform(0.9, 0.98, rows)).astype(np.int64)
+    loan_sanctioned = np.where(work_in_progress, loan_requested, loan_sanctioned)
+
+    requested_date = np.datetime64("2022-01-01") + rng.integers(0, 1095, rows).astype("timedelta64[D]")
+    approval_date = requested_date + rng.integers(1, 31, rows).astype("timedelta64[D]")
+    actual_tenure = rng.integers(10, 21, rows)
+    days_paid = (np.datetime64("2023-12-20") - approval_date).astype(np.int64)
+    paid_tenure = np.where(disbursed, np.round(days_paid / 365, 1), np.nan)
+
+    credit_score = np.where(
+        rng.random(rows) < 0.05, rng.integers(300, 650, rows), rng.integers(651, 850, rows)
+    )
 
-print(f"Dataset saved to {file_path_adjusted}")
+    dataset = pd.DataFrame({
+        "Customer ID": categorical(rng.integers(0, 9000, rows), [f"CUST-{n}" for n in range(1000, 10000)]),
+        "Customer Name": categorical(rng.integers(0, len(customer_names), rows), customer_names),
+        "Credit Score": credit_score,
+        "Employment History": categorical(rng.integers(0, 20, rows), [f"{n} years" for n in range(1, 21)]),
+        "Branch": categorical(
+            branch * len(regions) + region, [f"{b}-{r}" for b in additional_branches for r in regions]
+        ),
+        "Manager Name": categorical(
+            np.array([managers.index(branch_manager_mapping[b]) for b in additional_branches])[branch], managers
+        ),
+        "Loan Type": categorical(loan_type, loan_types),
+        "Submitted Asset Type": categorical(loan_type, [asset_types[loan] for loan in loan_types]),
+        "Asset Value": with_missing(asset_value, no_asset),
+        "Loan Amount Requested": loan_requested,
+        "Loan Amount Sanctioned": loan_sanctioned,
+        "Disbursed Amount": with_missing(loan_disbursed, ~disbursed),
+        "Rate of Interest (%)": np.round(rng.uniform(7, 14, rows), 2),
+        "Loan Insurance Taken": categorical(rng.integers(0, 2, rows), ["Yes", "No"]),
+        "Process Status": categorical(status, statuses),
+        "Query Type (Only WIP)": categorical(
+            np.where(work_in_progress, rng.integers(0, len(query_types), rows), -1), query_types
+        ),
+        "Requested Date": requested_date,
+        "Approval Date": approval_date,
+        "Actual Loan Tenure (Years)": actual_tenure,
+        "Paid Tenure (Years)": paid_tenure,
+        "Remaining Tenure (Years)": actual_tenure - paid_tenure,
+        "Late Repayments": rng.integers(0, 21, rows),
+        "KYC Document": categorical(rng.integers(0, len(kyc_documents), rows), kyc_documents),
+        "Proof of Identity": categorical(rng.integers(0, len(identity_choices), rows), identity_choices),
+        "Income Proof": categorical(rng.integers(0, len(income_choices), rows), income_choices)
+    })
+    return dataset[column_order]
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+def generate_chunks(rows, chunk_rows, rng):
+    """
+    Yield the dataset as consecutive chunks of at most chunk_rows records.
+    """
+    for offset in range(0, rows, chunk_rows):
+        yield generate_dataset(min(chunk_rows, rows - offset), rng)
+
+def report_progress(written, total_rows, started, label=""):
+    elapsed = time.perf_counter() - started
+    rate = written / elapsed if elapsed else 0
+    share = f" ({written / total_rows:.0%})" if total_rows else ""
+    total = f"{total_rows:,}" if total_rows else "?"
+    print(f"{label}{written:,}/{total} rows{share}, {rate:,.0f} rows/s, {elapsed:.1f}s")
+
+def mixed_columns(chunk):
+    """
+    List the object columns holding anything besides strings, such as the numbers and
+    "N/A" the loop mode mixes in one column. pyarrow cannot convert those.
+    """
+    return [
+        col for col in chunk.columns
+        if chunk[col].dtype == object and pd.api.types.infer_dtype(chunk[col], skipna=True) not in ("string", "empty")
+    ]
+
+def csv_table(chunk):
+    """
+    Convert a chunk to an Arrow table that the Arrow CSV writer formats like to_csv:
+    categories as their labels and dates as YYYY-MM-DD.
+    """
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_dictionary(field.type):
+            column = column.cast(field.type.value_type)
+        elif pa.types.is_timestamp(field.type):
+            column = column.cast(pa.date32())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+class DatasetWriter:
+    """
+    Writes chunks to one file as they are produced, so only one chunk is in memory.
+
+    CSV chunks are appended under a single header, through pyarrow's CSV writer when
+    it is installed (several times faster than to_csv) and with to_csv otherwise, or
+    when the first chunk has mixed_columns(). Each parquet chunk becomes a row group of
+    the same file, with mixed columns written as text.
+
+    Args:
+        path (str): The output file.
+        file_format (str): "csv" or "parquet".
+        append (bool): Add the rows to the end of an existing CSV file, without a header.
+    """
+
+    def __init__(self, path, file_format="csv", append=False):
+        if file_format == "parquet" and pq is None:
+            raise RuntimeError("Writing parquet needs pyarrow")
+        if append and file_format != "csv":
+            raise ValueError("Only CSV files can be appended to")
+        self.path = path
+        self.file_format = file_format
+        self.append = append
+        self.rows = 0
+        self._output = None
+        self._writer = None
+        # Whether CSV chunks go through to_csv, decided by the first chunk
+        self._text_csv = None
+
+    def write(self, chunk):
+        if self.file_format == "csv" and self._text_csv is None:
+            self._text_csv = pa is None or bool(mixed_columns(chunk))
+            if self._text_csv:
+                self._output = open(self.path, "a" if self.append else "w", newline="", encoding="utf-8")
+            elif self.append:
+                self._output = open(self.path, "ab")
+
+        if self._text_csv:
+            chunk.to_csv(self._output, index=False, header=self.rows == 0 and not self.append, date_format='%Y-%m-%d')
+        elif self.file_format == "csv":
+            table = csv_table(chunk)
+            if self._writer is None:
+                options = pa_csv.WriteOptions(include_header=not self.append)
+                self._writer = pa_csv.CSVWriter(self._output or self.path, table.schema, write_options=options)
+            self._writer.write_table(table)
+        else:
+            text = {
+                col: chunk[col].map(lambda value: value if isinstance(value, str) or pd.isna(value) else str(value))
+                for col in mixed_columns(chunk)
+            }
+            table = pa.Table.from_pandas(chunk.assign(**text) if text else chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._output is not None:
+            self._output.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_chunks(chunks, path, file_format="csv", total_rows=None, label="", append=False):
+    """
+    Write chunks to one file as they are produced, reporting progress after each one.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): The chunks, all with the same columns.
+        path (str): The output file.
+        file_format (str): "csv" or "parquet".
+        total_rows (int, optional): Expected row count, for the progress report.
+        label (str, optional): Prefix of the progress lines.
+        append (bool): Add the rows to the end of an existing CSV file.
+
+    Returns:
+        int: The number of rows written.
+    """
+    started = time.perf_counter()
+    with DatasetWriter(path, file_format, append) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+            report_progress(writer.rows, total_rows, started, label)
+    return writer.rows
+
+def save_dataset(dataset, path, file_format="csv"):
+    write_chunks([dataset], path, file_format, len(dataset))
+
+##############################################################################################
+# Parallel generation: one process per shard, each with its own spawned seed stream.
+
+def shard_sizes(rows, shards):
+    """
+    Split rows across shards, giving the remainder to the first shards.
+    """
+    return [rows // shards + (1 if shard < rows % shards else 0) for shard in range(shards)]
+
+def generate_shard(shard, rows, seed_sequence, output_dir, chunk_rows, file_format, partition, transform=None):
+    """
+    Generate one shard in chunks and write it under output_dir.
+
+    With partition "shard" the shard is one file, part-<shard>. With "month" every chunk
+    is split by requested-date month into requested_month=YYYY-MM/part-<shard>, so no
+    two processes ever write to the same file. transform(chunk, rng), if given, is
+    applied to every chunk before it is written.
+
+    Returns:
+        Tuple[int, int, float]: The shard, its row count and the seconds it took.
+    """
+    started = time.perf_counter()
+    label = f"shard {shard}: "
+    name = f"part-{shard:05d}.{file_format}"
+    rng = np.random.default_rng(seed_sequence)
+    chunks = generate_chunks(rows, chunk_rows, rng)
+    if transform is not None:
+        chunks = (transform(chunk, rng) for chunk in chunks)
+
+    if partition == "shard":
+        write_chunks(chunks, os.path.join(output_dir, name), file_format, rows, label)
+        return shard, rows, time.perf_counter() - started
+
+    writers = {}
+    written = 0
+    try:
+        for chunk in chunks:
+            months = chunk["Requested Date"].to_numpy().astype("datetime64[M]")
+            for month, month_rows in chunk.groupby(months, sort=True):
+                key = str(month)[:7]
+                if key not in writers:
+                    month_dir = os.path.join(output_dir, f"requested_month={key}")
+                    os.makedirs(month_dir, exist_ok=True)
+                    writers[key] = DatasetWriter(os.path.join(month_dir, name), file_format)
+                writers[key].write(month_rows)
+            written += len(chunk)
+            report_progress(written, rows, started, label)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return shard, rows, time.perf_counter() - started
+
+def generate_parallel(rows, output_dir, seed, workers, shards=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                      file_format="csv", partition="shard", transform=None):
+    """
+    Generate the dataset across worker processes into a partitioned output directory.
+
+    Each shard draws from its own stream spawned from SeedSequence(seed), so the output
+    depends only on the seed and the number of shards (by default one per worker), not
+    on scheduling. transform is passed on to generate_shard() and has to be a
+    module-level function so it can be sent to the worker processes.
+
+    Returns:
+        int: The number of rows written.
+    """
+    shards = shards or workers
+    os.makedirs(output_dir, exist_ok=True)
+    seed_sequences = np.random.SeedSequence(seed).spawn(shards)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(generate_shard, shard, shard_rows, seed_sequences[shard], output_dir,
+                            chunk_rows, file_format, partition, transform)
+            for shard, shard_rows in enumerate(shard_sizes(rows, shards))
+        ]
+        results = [future.result() for future in futures]
+
+    elapsed = time.perf_counter() - started
+    written = sum(shard_rows for _, shard_rows, _ in results)
+    print(f"Generated {written:,} rows in {shards} shards on {workers} workers: {elapsed:.1f}s, "
+          f"{written / elapsed if elapsed else 0:,.0f} rows/s")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic banking customer dataset.")
+    parser.add_argument("--rows", type=int, default=3000, help="Number of customer records to generate")
+    parser.add_argument("--mode", choices=["loop", "vectorized"], default="loop",
+                        help="loop draws row by row with random; vectorized draws every column at once with numpy")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible output")
+    parser.add_argument("--output", default="Synthetic_Banking_Customer_Dataset.csv",
+                        help="Output file, or output directory with --workers")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--chunk-rows", type=int, default=0,
+                        help="Generate and write this many rows at a time (vectorized mode), keeping memory flat")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Generate in this many processes (vectorized mode), writing a partitioned directory")
+    parser.add_argument("--shards", type=int, default=None, help="Number of shards with --workers (default: one per worker)")
+    parser.add_argument("--partition", choices=["shard", "month"], default="shard",
+                        help="With --workers: one file per shard, or per shard and requested-date month")
+    args = parser.parse_args()
+
+    file_path_adjusted = args.output
+    if (args.chunk_rows > 0 or args.workers > 0) and args.mode != "vectorized":
+        parser.error("--chunk-rows and --workers need --mode vectorized")
+
+    if args.workers > 0:
+        generate_parallel(args.rows, file_path_adjusted, args.seed, args.workers, args.shards,
+                          args.chunk_rows or DEFAULT_CHUNK_ROWS, args.format, args.partition)
+    elif args.chunk_rows > 0:
+        chunks = generate_chunks(args.rows, args.chunk_rows, np.random.default_rng(args.seed))
+        write_chunks(chunks, file_path_adjusted, args.format, args.rows)
+    else:
+        started = time.perf_counter()
+        if args.mode == "vectorized":
+            df_synthetic = generate_dataset(args.rows, np.random.default_rng(args.seed))
+        else:
+            random.seed(args.seed)
+            df_synthetic = generate_dataset_loop(args.rows)
+        print(f"Generated {args.rows} rows in {time.perf_counter() - started:.2f}s")
+        save_dataset(df_synthetic, file_path_adjusted, args.format)
+
+    print(f"Dataset saved to {file_path_adjusted}")
 
 
 
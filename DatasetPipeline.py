@@ -0,0 +1,76 @@
+"""
+Generate and label the synthetic banking dataset in one pass.
+
+Running DatasetCreator.py and then DatasetAlter.py writes the generated dataset to
+disk and parses it back before labelling. Here each chunk is generated, labelled with
+DatasetAlter.label_chunk() while still in memory, and written once:
+
+    python DatasetPipeline.py --rows 10000000 --seed 42 --output Synthetic_Banking_Customer_Dataset_1.csv
+    python DatasetPipeline.py --rows 10000000 --seed 42 --output labelled --workers 8 --format parquet
+
+Pass --raw-output to also keep the unlabelled dataset, as DatasetCreator.py writes it.
+"""
+import argparse
+
+import numpy as np
+
+from DatasetAlter import label_chunk
+from DatasetCreator import DEFAULT_CHUNK_ROWS, DatasetWriter, generate_chunks, generate_parallel, write_chunks
+
+
+def labelled_chunks(rows, chunk_rows, rng, raw_writer=None):
+    """
+    Yield generated chunks labelled with label_chunk(), writing each unlabelled chunk to
+    raw_writer first if one is given.
+    """
+    for chunk in generate_chunks(rows, chunk_rows, rng):
+        if raw_writer is not None:
+            raw_writer.write(chunk)
+        yield label_chunk(chunk, rng)
+
+def build_dataset(rows, output_path, seed=None, chunk_rows=DEFAULT_CHUNK_ROWS, file_format="csv", raw_output=None):
+    """
+    Generate, label and write the dataset chunk by chunk.
+
+    Args:
+        rows (int): Number of customer records.
+        output_path (str): The labelled dataset.
+        seed (int, optional): Seed for reproducible output.
+        chunk_rows (int): Rows generated and labelled at a time.
+        file_format (str): "csv" or "parquet", for both outputs.
+        raw_output (str, optional): Also write the unlabelled dataset here.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    if raw_output is None:
+        return write_chunks(labelled_chunks(rows, chunk_rows, rng), output_path, file_format, rows)
+    with DatasetWriter(raw_output, file_format) as raw_writer:
+        return write_chunks(labelled_chunks(rows, chunk_rows, rng, raw_writer), output_path, file_format, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and label the synthetic banking dataset in one pass.")
+    parser.add_argument("--rows", type=int, default=3000, help="Number of customer records to generate")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible output")
+    parser.add_argument("--output", default="Synthetic_Banking_Customer_Dataset_1.csv",
+                        help="Labelled output file, or output directory with --workers")
+    parser.add_argument("--raw-output", default=None,
+                        help="Also write the unlabelled dataset to this file (not with --workers)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows generated and labelled at a time")
+    parser.add_argument("--workers", type=int, default=0, help="Run in this many processes, writing a partitioned directory")
+    parser.add_argument("--shards", type=int, default=None, help="Number of shards with --workers (default: one per worker)")
+    parser.add_argument("--partition", choices=["shard", "month"], default="shard",
+                        help="With --workers: one file per shard, or per shard and requested-date month")
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        if args.raw_output:
+            parser.error("--raw-output is not supported with --workers")
+        generate_parallel(args.rows, args.output, args.seed, args.workers, args.shards, args.chunk_rows,
+                          args.format, args.partition, transform=label_chunk)
+    else:
+        build_dataset(args.rows, args.output, args.seed, args.chunk_rows, args.format, args.raw_output)
+    print(f"Labelled dataset saved to {args.output}")
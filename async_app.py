@@ -0,0 +1,396 @@
+"""
+Async serving mode for the dashboard.
+
+Serves the same /search, /categorySelected, /time-period-selected, /stats and /metrics
+routes as final_app.py, and the /stream variants, from a single event loop. The pandas
+work for each widget runs in worker threads, and every Azure OpenAI call goes through
+one AsyncAzureOpenAI client with a pooled keep-alive connection pool, so a request
+waiting on the LLM holds no thread. The dataset, the caches and the query parser are
+shared with final_app.
+
+It needs the packages in requirements-async.txt besides those final_app.py uses:
+
+    pip install -r requirements-async.txt
+
+Run it under an ASGI server, for example:
+
+    hypercorn async_app:app --bind 0.0.0.0:5000 --keep-alive 75
+"""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+from openai import AsyncAzureOpenAI
+from quart import Quart, g, request, jsonify
+from quart_cors import cors
+
+from final_app import (
+    AZURE_OPENAI_SETTINGS,
+    LLM_SYSTEM_PROMPT,
+    PROMETHEUS_CONTENT_TYPE,
+    QUERY_SYSTEM_PROMPT,
+    PROGRESS_STATUS_CONCURRENCY,
+    WIDGET_TIMEOUT_SECONDS,
+    DashboardPlan,
+    chat_completion_args,
+    llm_requests,
+    lookup_query,
+    parse_answer,
+    query_flights,
+    query_date_fallback,
+    query_parse_counts,
+    query_prompt,
+    read_query_answer,
+    record_completion,
+    remember_query,
+    render_metrics,
+    request_seconds,
+    server_sent_event,
+    service_stats,
+    timed,
+    widget_cache,
+    widget_flights,
+    widget_section,
+)
+
+# Connection pool of the shared Azure OpenAI client. Every widget prompt is one request,
+# so a dashboard needs up to 5 connections plus the progress_status chunks.
+LLM_MAX_CONNECTIONS = int(os.environ.get("DASHBOARD_LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("DASHBOARD_LLM_MAX_KEEPALIVE", "50"))
+LLM_KEEPALIVE_SECONDS = float(os.environ.get("DASHBOARD_LLM_KEEPALIVE_SECONDS", "60"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("DASHBOARD_LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("DASHBOARD_LLM_CONNECT_TIMEOUT", "5"))
+
+app = cors(Quart(__name__))
+
+# Created when the server starts, so the pool belongs to the serving event loop.
+async_llm = None
+
+
+@app.before_serving
+async def open_llm_client():
+    global async_llm
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+    )
+    async_llm = AsyncAzureOpenAI(**AZURE_OPENAI_SETTINGS, http_client=http_client)
+
+
+@app.after_serving
+async def close_llm_client():
+    if async_llm is not None:
+        await async_llm.close()
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop counterpart of final_app.SingleFlight, counting into the same counters so
+    /stats reports both servers alike.
+
+    The shared call runs as its own task. A caller that is cancelled, for example by a
+    timeout or a closed stream, stops waiting without cancelling it for the others.
+    """
+
+    def __init__(self, flights):
+        self.enabled = flights.enabled
+        self.counts = flights.counts
+        self._calls = {}
+
+    async def do(self, key, function, *args):
+        if not self.enabled:
+            return await function(*args)
+
+        task = self._calls.get(key)
+        if task is not None:
+            self.counts.increment("coalesced")
+            return await asyncio.shield(task)
+
+        self.counts.increment("calls")
+        task = self._calls[key] = asyncio.ensure_future(function(*args))
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+
+async_query_flights = AsyncSingleFlight(query_flights)
+async_widget_flights = AsyncSingleFlight(widget_flights)
+
+##############################################################################################
+
+async def complete_chat(user_prompt, system_prompt=LLM_SYSTEM_PROMPT, call=""):
+    started = time.perf_counter()
+    try:
+        completion = await async_llm.chat.completions.create(**chat_completion_args(user_prompt, system_prompt))
+    except Exception:
+        llm_requests.inc(call=call, outcome="error")
+        raise
+    record_completion(call, completion, time.perf_counter() - started)
+    return completion.choices[0].message.content
+
+
+async def answer_prompt(user_prompt, call=""):
+    try:
+        return parse_answer(await complete_chat(user_prompt, call=call))
+    except Exception as e:
+        return {"error": "Failed to get completion from Azure OpenAI", "details": str(e)}
+
+
+async def complete_widget(work, key=""):
+    """
+    Finish a WidgetWork, sending at most PROGRESS_STATUS_CONCURRENCY of its prompts at a time.
+    """
+    if work.body is not None:
+        return work.body
+
+    limit = asyncio.Semaphore(PROGRESS_STATUS_CONCURRENCY)
+
+    async def answer(user_prompt):
+        async with limit:
+            return await answer_prompt(user_prompt, key)
+
+    return work.merge(await asyncio.gather(*(answer(user_prompt) for user_prompt in work.prompts)))
+
+
+async def run_widget(key, prepare, args):
+    started = time.perf_counter()
+    with timed("widget_aggregation", key):
+        work = await asyncio.to_thread(prepare, *args)
+    if work.body is None:
+        with timed("widget_llm", key):
+            result = await complete_widget(work, key)
+    else:
+        result = work.body
+    print(f"{key} response.... {time.perf_counter() - started:.2f}s")
+    return result
+
+
+async def build_widget(widget_key, key, prepare, args):
+    """
+    Async counterpart of final_app.build_widget().
+    """
+    body = widget_cache.peek(widget_key)
+    if body is None:
+        body = await run_widget(key, prepare, args)
+        if isinstance(body, dict) and key in body:
+            widget_cache.put(widget_key, body)
+    return body
+
+
+async def iter_widgets(jobs, cache_key=None):
+    """
+    Build the dashboard widgets concurrently and yield each one as soon as it is finished.
+
+    Args:
+        jobs (dict): Maps each response key to a (prepare function, args) pair.
+        cache_key (Callable[[str], tuple], optional): Maps a response key to its widget
+            cache key, to cache finished widgets and share the ones other requests are
+            already building.
+
+    Yields:
+        Tuple[str, dict]: A response key and the widget's JSON body. A widget that raises
+        or takes longer than WIDGET_TIMEOUT_SECONDS gets an {"error": ...} body.
+    """
+    async def build(key, prepare, args):
+        if cache_key is None:
+            return await run_widget(key, prepare, args)
+        return await async_widget_flights.do(cache_key(key), build_widget, cache_key(key), key, prepare, args)
+
+    async def keyed_widget(key, prepare, args):
+        try:
+            return key, await asyncio.wait_for(build(key, prepare, args), WIDGET_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return key, {"error": f"Timed out after {WIDGET_TIMEOUT_SECONDS}s"}
+        except Exception as e:
+            return key, {"error": str(e)}
+
+    tasks = [asyncio.ensure_future(keyed_widget(key, prepare, args)) for key, (prepare, args) in jobs.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Widgets that a closed stream no longer needs
+        for task in tasks:
+            task.cancel()
+
+
+async def run_widgets(jobs, cache_key=None):
+    """
+    Build the dashboard widgets with iter_widgets() and wait for all of them.
+
+    Returns:
+        dict: Maps each response key to the widget's JSON body.
+    """
+    return {key: body async for key, body in iter_widgets(jobs, cache_key)}
+
+##############################################################################################
+
+async def api_ask_question(query_text, category=None, timePeriod=None):
+    """
+    Async counterpart of final_app.api_ask_question(), sharing its cache and fast path.
+    """
+    key, today, response_data = await asyncio.to_thread(lookup_query, query_text, category, timePeriod)
+    if response_data is None:
+        response_data = dict(await async_query_flights.do(
+            key, parse_and_remember_query, key, query_text, category, timePeriod, today
+        ))
+    return response_data
+
+
+async def parse_and_remember_query(key, query_text, category, timePeriod, today):
+    query_parse_counts.increment("llm")
+    response_data = await parse_query_with_llm(query_text, category, timePeriod, today)
+    remember_query(key, today, response_data)
+    return response_data
+
+
+async def parse_query_with_llm(query_text, category, timePeriod, today):
+    try:
+        with timed("query_llm"):
+            response = await complete_chat(query_prompt(query_text, category, timePeriod, today), QUERY_SYSTEM_PROMPT, "query")
+        return read_query_answer(response)
+    except ValueError as date_error:
+        return query_date_fallback(today, date_error)
+    except Exception as e:
+        return {"error from the LLM": str(e)}
+
+
+async def extracter(response_json, render=None):
+    """
+    Async counterpart of final_app.extracter().
+    """
+    render = render or (lambda body: body)
+    try:
+        plan = await asyncio.to_thread(DashboardPlan, response_json)
+        if plan.no_records:
+            return render(plan.no_records_response())
+
+        computed = {}
+        if plan.jobs:
+            print("Started to load....")
+            computed = await run_widgets(plan.jobs, plan.cache_key)
+        with timed("response_assembly"):
+            return render(plan.response(computed))
+    except json.JSONDecodeError as e:
+        return render({"error": "Invalid JSON format in response", "details": str(e)})
+    except Exception as e:
+        return render({"error while aggregating the response ": str(e)})
+
+
+async def stream_dashboard(query_text, category=None, timePeriod=None):
+    """
+    Async counterpart of final_app.stream_dashboard(), sending the same events.
+    """
+    started = time.perf_counter()
+    try:
+        response_json = await api_ask_question(query_text, category=category, timePeriod=timePeriod)
+        yield server_sent_event("query", response_json)
+
+        plan = await asyncio.to_thread(DashboardPlan, response_json)
+        if plan.no_records:
+            yield server_sent_event("noRecords", plan.no_records_response())
+        else:
+            yield server_sent_event("dashboard", plan.header())
+            for key, body in plan.results.items():
+                if body is not None:
+                    yield server_sent_event(key, {key: widget_section(plan.results, key)})
+            async for key, body in iter_widgets(plan.jobs, plan.cache_key):
+                yield server_sent_event(key, {key: widget_section({key: body}, key)})
+    except Exception as e:
+        yield server_sent_event("error", {"error": str(e)})
+    yield server_sent_event("done", {"seconds": round(time.perf_counter() - started, 3)})
+
+
+def event_stream(events):
+    return events, 200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def stream_request_data():
+    return await request.get_json(silent=True) or request.args
+
+##############################################################################################
+
+@app.route('/search', methods=['GET'])
+async def search():
+    data = await request.get_json()
+    query_text = data.get("query", "")
+    try:
+        response_json = await api_ask_question(query_text)
+        return await extracter(response_json, jsonify)
+    except Exception as e:
+        return jsonify({"error is ": str(e)})
+
+
+@app.route('/categorySelected', methods=['GET'])
+async def category_selected():
+    data = await request.get_json()
+    query_text = data.get("query", "")
+    catType = data.get("categoryType","")
+    try:
+        response_json = await api_ask_question(query_text, category=catType, timePeriod=None)
+        return await extracter(response_json, jsonify)
+    except Exception as e:
+        return jsonify({"error is ": str(e)})
+
+
+@app.route('/time-period-selected', methods=['GET'])
+async def time_period_selected():
+    data = await request.get_json()
+    query_text = data.get("query", "")
+    time_periodType = data.get("timePeriod", "").lower()
+    try:
+        response_timeperiod_json = await api_ask_question(query_text, category=None, timePeriod=time_periodType)
+        return await extracter(response_timeperiod_json, jsonify)
+    except Exception as e:
+        return jsonify({"timePeriod_error is ": str(e)})
+
+
+@app.route('/search/stream', methods=['GET', 'POST'])
+async def search_stream():
+    data = await stream_request_data()
+    return event_stream(stream_dashboard(data.get("query", "")))
+
+
+@app.route('/categorySelected/stream', methods=['GET', 'POST'])
+async def category_selected_stream():
+    data = await stream_request_data()
+    return event_stream(stream_dashboard(data.get("query", ""), category=data.get("categoryType", "")))
+
+
+@app.route('/time-period-selected/stream', methods=['GET', 'POST'])
+async def time_period_selected_stream():
+    data = await stream_request_data()
+    return event_stream(stream_dashboard(data.get("query", ""), timePeriod=data.get("timePeriod", "").lower()))
+
+
+@app.route('/stats', methods=['GET'])
+async def stats():
+    return jsonify(service_stats())
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return render_metrics(), 200, {"Content-Type": PROMETHEUS_CONTENT_TYPE}
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def observe_request(response):
+    # Streamed responses are timed until their headers are sent
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_seconds.observe(time.perf_counter() - started, route=route, status=response.status_code)
+    return response
+
+if __name__ == "__main__":
+    app.run()
@@ -0,0 +1,273 @@
+"""
+Micro-benchmarks for the dashboard's pandas pipeline.
+
+Generates datasets with the DatasetCreator.py / DatasetAlter.py schema at several
+scales and times each stage on its own: CSV load, date parsing, the snapshot build
+(sort, bitmap indexes, cube), the date/loanType/region filtering done for extracter(),
+each widget's aggregation on raw rows and on the cube, and the prompt serialization done
+by question_prompt() in each prompt encoding, with the tokens each encoding costs. Every
+stage also records its peak traced memory.
+
+    python benchmark.py --scales 3000,300000 --output benchmark_results.json
+    python benchmark.py --scales 3000,300000 --baseline benchmark_results.json
+
+Generated datasets are kept in --data-dir and reused by later runs. Larger scales are
+opt-in, e.g. --scales 3000,300000,30000000; at 30M rows the CSV takes several GB of disk
+and the loaded frame several GB of memory.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# final_app requires an Azure OpenAI key at import; the benchmark never calls the LLM
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "unused")
+
+import final_app
+from DatasetPipeline import build_dataset
+from final_app import (
+    PROMPT_ENCODING_NOTES,
+    DatasetCube,
+    DatasetSnapshot,
+    count_tokens,
+    encode_data,
+    feather,
+    load_dataset,
+    prepare_case_status,
+    prepare_categories,
+    prepare_loan_processing,
+    prepare_loan_summary,
+    prepare_progress_status,
+    read_dataset_csv,
+    summarize_progress,
+)
+
+DEFAULT_SCALES = [3_000, 300_000]
+GENERATION_CHUNK_ROWS = 1_000_000
+
+# The window and filters every filter and widget stage is run with
+BENCHMARK_WINDOW = (datetime(2023, 7, 1), datetime(2023, 9, 30))
+PREVIOUS_WINDOW = (datetime(2023, 4, 1), datetime(2023, 6, 30))
+BENCHMARK_LOAN_TYPE = "Housing Loan"
+BENCHMARK_REGION = "Mumbai"
+
+##############################################################################################
+# Dataset generation
+
+def ensure_dataset(rows, data_dir, seed):
+    """
+    Return the path of the benchmark CSV for a scale, generating it in chunks if needed.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"banking_{rows}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+
+    partial_path = path + ".partial"
+    started = time.perf_counter()
+    build_dataset(rows, partial_path, seed, GENERATION_CHUNK_ROWS)
+    os.replace(partial_path, path)
+    print(f"Generated {rows} rows in {time.perf_counter() - started:.1f}s: {path}")
+    return path
+
+##############################################################################################
+# Timing
+
+def measure(function, repeat, max_seconds, track_memory):
+    """
+    Time a stage and record its peak traced memory.
+
+    The stage runs up to repeat times, stopping early once max_seconds have been
+    spent, then once more under tracemalloc so tracing does not skew the timings.
+
+    Returns:
+        Tuple[Any, dict]: The stage's result and its measurements.
+    """
+    timings = []
+    result = None
+    while len(timings) < repeat and (not timings or sum(timings) < max_seconds):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+
+    measurement = {
+        "seconds": round(statistics.median(timings), 6),
+        "minSeconds": round(min(timings), 6),
+        "runs": len(timings)
+    }
+    if track_memory:
+        tracemalloc.start()
+        function()
+        measurement["peakMB"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 3)
+        tracemalloc.stop()
+    return result, measurement
+
+
+def widget_stages(selected, previous):
+    """
+    The aggregation of every widget for one kind of input (raw rows or cube slice).
+    """
+    return {
+        "case_status": lambda: prepare_case_status(selected),
+        "progress_status": lambda: prepare_progress_status(selected),
+        "loan_processing": lambda: prepare_loan_processing(selected, previous),
+        "categories": lambda: prepare_categories(selected, "quarterly", "retailLoan"),
+        "loan_summary": lambda: prepare_loan_summary(selected),
+    }
+
+
+def benchmark_scale(rows, args):
+    """
+    Run every stage on the dataset of one scale.
+
+    Returns:
+        dict: Maps each stage name to its measurements.
+    """
+    path = ensure_dataset(rows, args.data_dir, args.seed)
+    results = {}
+
+    def run(stage, function):
+        result, results[stage] = measure(function, args.repeat, args.max_seconds, not args.skip_memory)
+        print(f"  {stage:<36}{results[stage]['seconds']:>10.4f}s{results[stage].get('peakMB', 0):>11.1f} MB")
+        return result
+
+    frame = run("load_csv", lambda: read_dataset_csv(path))
+    raw_dates = pd.read_csv(path, usecols=["Requested Date", "Approval Date"], dtype=str)
+    run("date_parse", lambda: (
+        pd.to_datetime(raw_dates["Approval Date"], format="%d-%m-%Y", errors="coerce"),
+        pd.to_datetime(raw_dates["Requested Date"], errors="coerce")
+    ))
+
+    if feather is not None and final_app.USE_DATASET_SIDECAR:
+        # The app's own path: validate the sidecar against the CSV, then map it.
+        # The first call writes the sidecar if it is missing or stale.
+        load_dataset(path)
+
+        def load_sidecar():
+            dataset, source = load_dataset(path)
+            if source != "sidecar":
+                raise RuntimeError(f"load_dataset read the {source}, not the sidecar")
+            return dataset
+
+        run("load_sidecar", load_sidecar)
+
+    snapshot = run("snapshot_build", lambda: DatasetSnapshot(frame, 0, 0, 0.0, "benchmark"))
+    run("cube_build", lambda: DatasetCube(snapshot.frame, snapshot.dated_rows))
+    if snapshot.cube is None:
+        snapshot.cube = DatasetCube(snapshot.frame, snapshot.dated_rows)
+
+    start, end = BENCHMARK_WINDOW
+    selected = run("filter_rows", lambda: snapshot.select_rows(start, end))
+    previous = snapshot.select_rows(*PREVIOUS_WINDOW)
+    run("filter_rows_loan_type_region", lambda: snapshot.select_rows(start, end, BENCHMARK_LOAN_TYPE, BENCHMARK_REGION))
+
+    def select_cube():
+        cube_slice = snapshot.cube.select(start, end, None, None)
+        cube_slice.cells
+        return cube_slice
+
+    cube_selected = run("filter_cube", select_cube)
+    cube_previous = snapshot.cube.select(*PREVIOUS_WINDOW, None, None)
+
+    # Aggregation only: the local renderers skip building prompts
+    final_app.LOCAL_WIDGETS.add("all")
+    try:
+        for name, function in widget_stages(selected, previous).items():
+            run(f"widget_{name}_rows", function)
+        run("progress_groupby_apply", lambda: summarize_progress(selected))
+        for name, function in widget_stages(cube_selected, cube_previous).items():
+            run(f"widget_{name}_cube", function)
+    finally:
+        final_app.LOCAL_WIDGETS.discard("all")
+
+    progress_summary = summarize_progress(selected)[0]
+    loan_summary_data = selected.assign(
+        Month=selected["Requested Date"].dt.strftime("%b-%Y").str.upper()
+    ).groupby(["Loan Type", "Month"], observed=True).agg({"Customer ID": "count"}).reset_index()
+    for encoding in PROMPT_ENCODING_NOTES:
+        stage = "json_serialization" if encoding == "records" else f"{encoding}_serialization"
+        encoded = run(stage, lambda: (
+            encode_data(progress_summary, encoding),
+            encode_data(loan_summary_data, encoding)
+        ))
+        # Tokens of the widget data in this encoding, to compare against JSON records
+        results[stage]["promptTokens"] = sum(count_tokens(text) for text in encoded)
+        print(f"  {'':<36}{results[stage]['promptTokens']:>10} prompt tokens")
+    return results
+
+##############################################################################################
+# Results and baselines
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Print each stage's time against the baseline and return the regressions.
+
+    Returns:
+        List[str]: "scale/stage" for every stage slower than threshold x baseline and
+        by more than min_delta seconds, so sub-millisecond noise is not reported.
+    """
+    regressions = []
+    print(f"\n{'scale/stage':<48}{'baseline':>11}{'current':>11}{'ratio':>8}")
+    for scale, stages in results["results"].items():
+        for stage, measurement in stages.items():
+            before = baseline.get("results", {}).get(scale, {}).get(stage)
+            if not before or not before["seconds"]:
+                continue
+            ratio = measurement["seconds"] / before["seconds"]
+            slower = ratio > threshold and measurement["seconds"] - before["seconds"] > min_delta
+            flag = "  REGRESSION" if slower else ""
+            print(f"{scale + '/' + stage:<48}{before['seconds']:>10.4f}s{measurement['seconds']:>10.4f}s{ratio:>7.2f}x{flag}")
+            if flag:
+                regressions.append(f"{scale}/{stage}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's pandas pipeline.")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="Comma-separated row counts, e.g. 3000,300000")
+    parser.add_argument("--data-dir", default="benchmark_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage")
+    parser.add_argument("--max-seconds", type=float, default=30, help="Stop repeating a stage after this long")
+    parser.add_argument("--skip-memory", action="store_true", help="Do not measure peak memory")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="Slowdowns under this many seconds are ignored")
+    args = parser.parse_args()
+
+    results = {
+        "createdAt": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "pyarrow": feather is not None,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count()
+        },
+        "results": {}
+    }
+    for rows in [int(scale) for scale in args.scales.split(",")]:
+        print(f"{rows} rows")
+        results["results"][str(rows)] = benchmark_scale(rows, args)
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than {args.threshold}x the baseline")
+            sys.exit(1)
@@ -0,0 +1,36 @@
+"""
+Shared fixtures: a small seeded dataset and a dashboard built from it.
+"""
+import os
+
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+
+import final_app
+from DatasetPipeline import build_dataset
+
+
+@pytest.fixture(scope="session")
+def dataset_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("dataset") / "dataset.csv"
+    build_dataset(20_000, str(path), seed=7, chunk_rows=5_000)
+    return str(path)
+
+
+@pytest.fixture
+def dashboard(monkeypatch, dataset_path):
+    """
+    Return a function that builds the local-widget dashboard for a window, with the cube on or off.
+    """
+    monkeypatch.setattr(final_app, "LOCAL_WIDGETS", {"all"})
+    monkeypatch.setattr(final_app, "USE_DATASET_SIDECAR", False)
+
+    def build(response_json, use_cube):
+        monkeypatch.setattr(final_app, "USE_CUBE", use_cube)
+        monkeypatch.setattr(final_app, "dataset_store", final_app.DatasetStore(dataset_path))
+        monkeypatch.setattr(final_app, "widget_cache", final_app.LRUCache(final_app.WIDGET_CACHE_SIZE))
+        assert (final_app.dataset_store.get().cube is not None) == use_cube
+        return final_app.extracter(response_json)
+
+    return build
@@ -0,0 +1,307 @@
+"""
+Local stand-in for the Azure OpenAI chat completions API.
+
+Answers every chat completion request after a simulated latency. It returns JSON that
+follows the format each dashboard prompt asks for, so final_app.py and async_app.py
+can be load tested with no network. Start it, then point the app at it:
+
+    python fake_openai.py --port 8100 --latency lognormal:0.2,0.5
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8100/ AZURE_OPENAI_API_KEY=fake python final_app.py
+
+Latency specs:
+    fixed:S              always S seconds
+    uniform:LOW,HIGH     uniformly between LOW and HIGH seconds
+    normal:MEAN,STD      normal, clipped at 0
+    lognormal:MU,SIGMA   exp(normal(MU, SIGMA)) seconds, the long tail of a real LLM
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def latency_sampler(spec):
+    """
+    Build a function returning simulated latencies, in seconds, from a latency spec.
+
+    Args:
+        spec (str): One of the specs listed in the module docstring, e.g. "uniform:0.5,2".
+
+    Returns:
+        Callable[[], float]: The sampler.
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda: math.exp(random.gauss(values[0], values[1]))
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+##############################################################################################
+# Canned replies, one per dashboard prompt.
+
+def number(value):
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+def prompt_records(prompt):
+    """
+    Return the data records embedded in a widget prompt, or [] if there are none.
+
+    The data may be JSON records, JSON columns ({"columns": [...], "data": [[...]]})
+    or CSV with a header row, as final_app.encode_data() writes it.
+    """
+    match = re.search(r"Processed Loan Data[^\n]*:\s*\n(.*?)\n\s*\n", prompt, re.S)
+    if not match:
+        return []
+    data = match.group(1).strip()
+    try:
+        decoded = json.loads(data)
+    except ValueError:
+        rows = list(csv.DictReader(io.StringIO(data.replace("\n    ", "\n"))))
+        return [{key: number(value) for key, value in row.items()} for row in rows]
+    if isinstance(decoded, dict) and "columns" in decoded:
+        return [dict(zip(decoded["columns"], row)) for row in decoded.get("data", [])]
+    return decoded if isinstance(decoded, list) else []
+
+
+def reply_case_status(prompt):
+    records = prompt_records(prompt)
+    colors = {"WORK_IN_PROGRESS": "#7E3BF0", "SANCTIONED": "#B0AFFF", "DISBURSED": "#3B39F0"}
+    by_status = {str(record.get("Process Status", "")).upper().replace(" ", "_"): record for record in records}
+    amounts = {status: by_status.get(status, {}).get("sanctioned_amount_usd") or 0 for status in colors}
+    total = sum(amounts.values()) or 1
+    return {
+        "caseStatusForBarchart": {
+            "total": [
+                {
+                    "status": status,
+                    "amount": round(amounts[status], 2),
+                    "caseCount": by_status.get(status, {}).get("cases", 0),
+                    "fillColor_percentage": round(amounts[status] / total * 100, 2),
+                    "color": color
+                }
+                for status, color in colors.items()
+            ]
+        }
+    }
+
+
+def reply_progress_status(prompt):
+    items = [
+        {
+            "branch": record.get("Branch", ""),
+            "branchManager": record.get("branchManager", ""),
+            "operational": record.get("operational", 0),
+            "credit": record.get("credit", 0),
+            "salesQueries": record.get("salesQueries", 0),
+            "total": record.get("total", 0)
+        }
+        for record in prompt_records(prompt)
+    ]
+    return {"progressStatus": {"commonTitle": "Progress Status", "items": items}}
+
+
+def reply_loan_processing(prompt):
+    metrics = [("Approval Rate", "red", "down"), ("Denial Rate", "green", "up"), ("Submission Cancelled", "red", "down")]
+    return {
+        "metrics": {
+            "commonTitle": "Loan Processing",
+            "items": [
+                {
+                    "subTitle": title,
+                    "value": f"{random.uniform(5, 80):.1f}%",
+                    "diffValue": f"{random.uniform(0, 5):.1f}%",
+                    "color": color,
+                    "direction": direction
+                }
+                for title, color, direction in metrics
+            ]
+        }
+    }
+
+
+def reply_categories(prompt):
+    keys = [
+        ("HOUSING_LOAN", "Housing Loan"), ("VEHICLE_LOAN", "Vehicle Loan"), ("EDUCATIONAL_LOAN", "Educational Loan"),
+        ("PERSONAL_LOAN", "Personal Loan"), ("GOLD_LOAN", "Gold Loan"), ("LOAN_AGAINST_PROPERTY", "Loan Against Property")
+    ]
+    return {
+        "categoryKeyArr": [{"dataKey": "ALL_CATEGORIES", "fill": "#4A3AFF", "label": "All Categories", "selected": True}] + [
+            {"dataKey": key, "fill": "#4A3AFF", "label": label, "percentageValue": f"{100 / len(keys):.2f}%", "selected": False}
+            for key, label in keys
+        ]
+    }
+
+
+def reply_loan_summary(prompt):
+    months = {}
+    for record in prompt_records(prompt):
+        loan_key = str(record.get("Loan Type", "")).upper().replace(" ", "_")
+        month = months.setdefault(record.get("Month", ""), {"name": record.get("Month", "")})
+        month[loan_key] = {"cases": record.get("total_cases", 0), "amount": record.get("total_amount", 0)}
+    details = list(months.values())
+    return {
+        "barChart": {
+            "barChartLeftLbl": "Total Logged In Cases",
+            "barChartRightLbl": "Total Loan Amount",
+            "barChartRightValue": sum(v["amount"] for d in details for k, v in d.items() if k != "name"),
+            "barChartLeftValue": sum(v["cases"] for d in details for k, v in d.items() if k != "name"),
+            "chartDetails": details
+        }
+    }
+
+
+def reply_query(prompt):
+    """
+    Answer the date-extraction prompt: a quarter or year named in the query, or Q3 2023.
+    """
+    query = prompt.split("Query:", 1)[-1].split("Additional Information:", 1)[0]
+    year = re.search(r"\b(202[2-4])\b", query)
+    quarter = re.search(r"\bq([1-4])\b", query, re.I)
+    if year and quarter:
+        first_month = (int(quarter.group(1)) - 1) * 3 + 1
+        last_day = {3: 31, 6: 30, 9: 30, 12: 31}[first_month + 2]
+        start, end, period = f"{year.group(1)}-{first_month:02d}-01", f"{year.group(1)}-{first_month + 2:02d}-{last_day}", "quarterly"
+    elif year:
+        start, end, period = f"{year.group(1)}-01-01", f"{year.group(1)}-12-31", "annually"
+    else:
+        start, end, period = "2023-07-01", "2023-09-30", "quarterly"
+    return {
+        "startDate": start,
+        "endDate": end,
+        "region": "Pan India",
+        "loanType": "retailLoan",
+        "queryType": "logged-in cases",
+        "status": "allcategories",
+        "timePeriod": period
+    }
+
+
+def canned_reply(messages):
+    """
+    Pick the reply for a chat request from what its prompt asks for.
+
+    Returns:
+        Tuple[str, dict]: The prompt kind and the JSON reply.
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    if '"queryType"' in prompt:
+        return "query", reply_query(prompt)
+    if "caseStatusForBarchart" in prompt:
+        return "case_status", reply_case_status(prompt)
+    if "progressStatus" in prompt:
+        return "progress_status", reply_progress_status(prompt)
+    if "categoryKeyArr" in prompt:
+        return "categories", reply_categories(prompt)
+    if '"metrics"' in prompt:
+        return "loan_processing", reply_loan_processing(prompt)
+    if '"barChart"' in prompt:
+        return "loan_summary", reply_loan_summary(prompt)
+    return "unknown", {}
+
+##############################################################################################
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            return self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        request_json = json.loads(body or b"{}")
+        messages = request_json.get("messages", [])
+        kind, reply = canned_reply(messages)
+        time.sleep(self.server.sample_latency())
+        self.server.count(kind)
+
+        if random.random() < self.server.error_rate:
+            return self.send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+
+        content = json.dumps(reply)
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+        completion_tokens = len(content) // 4
+        self.send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request_json.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"```json\n{content}\n```"},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def do_GET(self):
+        self.send_json(200, {"requests": self.server.counts_snapshot()})
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, sample_latency, error_rate=0.0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.sample_latency = sample_latency
+        self.error_rate = error_rate
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, kind):
+        with self._lock:
+            self._counts[kind] = self._counts.get(kind, 0) + 1
+
+    def counts_snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Azure OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="uniform:0.5,2.0", help="Latency spec, e.g. fixed:1 or lognormal:0.2,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server = FakeOpenAIServer((args.host, args.port), latency_sampler(args.latency), args.error_rate)
+    print(f"Fake Azure OpenAI listening on http://{args.host}:{args.port}/ (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
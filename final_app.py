@@ -1,31 +1,994 @@
 import pandas as pd
-from flask import Flask, request, jsonify
+import numpy as np
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from openai import AzureOpenAI
+import hashlib
 import json
+import os
+import threading
+import time
 import warnings
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from calendar import monthrange
 import re
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 warnings.filterwarnings("ignore")
 
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 app = Flask(__name__)
 CORS(app)
 
 
-llm = AzureOpenAI(
-    api_key='32726a649d7b4d6a8e0b2d770c72155c',
+# Point AZURE_OPENAI_ENDPOINT at fake_openai.py to run without the real service; it
+# accepts any AZURE_OPENAI_API_KEY.
+if not os.environ.get("AZURE_OPENAI_API_KEY"):
+    raise RuntimeError("AZURE_OPENAI_API_KEY is not set; set it to the Azure OpenAI key of the deployment")
+
+AZURE_OPENAI_SETTINGS = dict(
+    api_key=os.environ["AZURE_OPENAI_API_KEY"],
     api_version='2024-08-01-preview',
-    azure_endpoint='https://aina-coc.openai.azure.com/',
+    azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT", 'https://aina-coc.openai.azure.com/'),
     azure_deployment='gpt-4o-2'
 )
 
+llm = AzureOpenAI(**AZURE_OPENAI_SETTINGS)
+
+DATASET_PATH = os.environ.get(
+    "DASHBOARD_DATASET_PATH",
+    r"C:\week3_assignment\Synthetic_Banking_Customer_Dataset_1.csv"
+)
+# Set DASHBOARD_DATASET_SIDECAR=0 to always parse the CSV.
+USE_DATASET_SIDECAR = os.environ.get("DASHBOARD_DATASET_SIDECAR", "1") != "0"
+# Schema metadata key holding the modification time and size of the CSV a sidecar was built from.
+SIDECAR_SOURCE_KEY = b"dashboard.source"
+
+# Columns that mix numbers with "N/A" in the CSV and are stored as floats.
+NUMERIC_COLUMNS = [
+    "Credit Score", "Asset Value", "Loan Amount Requested", "Loan Amount Sanctioned",
+    "Disbursed Amount", "Rate of Interest (%)", "Actual Loan Tenure (Years)",
+    "Paid Tenure (Years)", "Remaining Tenure (Years)", "Late Repayments",
+    "empSal", "EMI Amount", "Employed Company"
+]
+# Categorical columns that get a bitmap index for the loanType/region filters.
+INDEXED_COLUMNS = ["Loan Type", "Branch"]
+# How many distinct loanType/region filter strings each index remembers the codes of.
+RESOLVED_TERMS_CACHE_SIZE = 256
+# Set DASHBOARD_CUBE=0 to aggregate the raw rows for every request.
+USE_CUBE = os.environ.get("DASHBOARD_CUBE", "1") != "0"
+# Dimensions and summed measures of the monthly cube; 'Customer ID' holds the loan count.
+CUBE_DIMENSIONS = ["Loan Type", "Branch", "Process Status", "LoanStatus", "Query Type (Only WIP)"]
+CUBE_MEASURES = ["Loan Amount Requested", "Loan Amount Sanctioned", "Disbursed Amount"]
+# Status columns with month prefix sums, for O(1) range aggregates grouped by them.
+PREFIX_SUM_COLUMNS = ["LoanStatus", "Process Status"]
+# Low-cardinality string columns that are stored as categoricals.
+CATEGORICAL_COLUMNS = [
+    "Customer Name", "Employment History", "Branch", "Manager Name", "Loan Type",
+    "Submitted Asset Type", "Loan Insurance Taken", "Process Status", "Query Type (Only WIP)",
+    "KYC Document", "Proof of Identity", "Income Proof", "LoanStatus", "Reason"
+]
+
+##############################################################################################
+# Metrics: per-stage latency histograms and LLM counters, served in the Prometheus text
+# format on /metrics.
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def metric_labels(label_names, values):
+    if not label_names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped)) + "}"
+
+
+def metric_header(name, documentation, kind):
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+
+
+class MetricCounter:
+    """
+    A thread-safe Prometheus counter with one series per combination of label values.
+    """
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return metric_header(self.name, self.documentation, "counter") + [
+            f"{self.name}{metric_labels(self.label_names, key)} {value}" for key, value in values
+        ]
+
+
+class MetricHistogram:
+    """
+    A thread-safe Prometheus histogram with one series per combination of label values.
+    """
+
+    def __init__(self, name, documentation, label_names=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            bucket = bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def lines(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = metric_header(self.name, self.documentation, "histogram")
+        bucket_labels = self.label_names + ("le",)
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{metric_labels(bucket_labels, key + (repr(float(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{metric_labels(bucket_labels, key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{metric_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{metric_labels(self.label_names, key)} {count}")
+        return lines
+
+
+stage_seconds = MetricHistogram(
+    "dashboard_stage_seconds", "Time spent in each stage of building a dashboard.", ("stage", "widget")
+)
+request_seconds = MetricHistogram(
+    "dashboard_request_seconds", "Time until each HTTP response is returned.", ("route", "status")
+)
+llm_requests = MetricCounter(
+    "dashboard_llm_requests_total", "Azure OpenAI chat completion requests.", ("call", "outcome")
+)
+llm_tokens = MetricCounter(
+    "dashboard_llm_tokens_total", "Tokens reported in the usage of Azure OpenAI completions.", ("call", "kind")
+)
+
+
+@contextmanager
+def timed(stage, widget=""):
+    """
+    Record how long the with-block takes in the dashboard_stage_seconds histogram.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage, widget=widget)
+
+
+def record_completion(call, completion, seconds):
+    """
+    Count a finished chat completion and the tokens its usage reports.
+
+    Args:
+        call (str): "query", or the response key of the widget that sent the prompt.
+        completion: The chat completion returned by the client.
+        seconds (float): How long the request took.
+    """
+    stage_seconds.observe(seconds, stage="llm_request", widget=call)
+    llm_requests.inc(call=call, outcome="ok")
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        llm_tokens.inc(usage.prompt_tokens or 0, call=call, kind="prompt")
+        llm_tokens.inc(usage.completion_tokens or 0, call=call, kind="completion")
+
+
+def read_dataset_csv(path):
+    """
+    Read the banking dataset CSV and apply the column types used by the dashboard.
+
+    Args:
+        path (str): Path of the CSV written by DatasetAlter.py.
+
+    Returns:
+        pd.DataFrame: The typed dataset.
+    """
+    dataset = pd.read_csv(path)
+    with timed("date_parse"):
+        dataset['Approval Date'] = pd.to_datetime(dataset['Approval Date'], format="%d-%m-%Y", errors='coerce')
+        dataset['Requested Date'] = pd.to_datetime(dataset['Requested Date'], errors='coerce')
+
+    for col in NUMERIC_COLUMNS:
+        if col in dataset.columns:
+            dataset[col] = pd.to_numeric(dataset[col], errors='coerce')
+    for col in CATEGORICAL_COLUMNS:
+        if col in dataset.columns:
+            dataset[col] = dataset[col].astype('category')
+
+    return sort_by_requested_date(dataset)
+
+
+def sort_by_requested_date(dataset):
+    """
+    Order the dataset by 'Requested Date', with rows that have no date at the end.
+
+    Args:
+        dataset (pd.DataFrame): The typed dataset.
+
+    Returns:
+        pd.DataFrame: The same frame if it is already in that order, otherwise a sorted copy.
+    """
+    dates = dataset['Requested Date']
+    dated_rows = int(dates.notna().sum())
+    if dates.iloc[:dated_rows].notna().all() and dates.iloc[:dated_rows].is_monotonic_increasing:
+        return dataset
+    return dataset.sort_values('Requested Date', kind='stable', na_position='last').reset_index(drop=True)
+
+
+def sidecar_path(path):
+    """
+    Return the path of the columnar cache file kept next to the dataset CSV.
+    """
+    return os.path.splitext(path)[0] + ".feather"
+
+
+def sidecar_source(stat):
+    """
+    Describe the CSV a sidecar was built from, for the sidecar's schema metadata.
+    """
+    return json.dumps({"mtimeNs": stat.st_mtime_ns, "size": stat.st_size}).encode()
+
+
+def write_sidecar(dataset, path, source_stat):
+    """
+    Write the typed dataset to an uncompressed Feather file so it can be memory mapped.
+
+    The modification time and size of the CSV it was built from are stored in the
+    schema metadata. The file is written under a temporary name and moved into place,
+    so readers never see a half-written sidecar.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(dataset.reset_index(drop=True), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[SIDECAR_SOURCE_KEY] = sidecar_source(source_stat)
+        feather.write_feather(table.replace_schema_metadata(metadata), temp_path, compression="uncompressed")
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_dataset(path, stat=None):
+    """
+    Load the typed dataset, preferring the Feather sidecar when it was built from the CSV as it is now.
+
+    A sidecar is used only when the CSV modification time and size stored in it match
+    the file exactly, so a CSV restored with an older modification time is not served
+    from a stale sidecar. A missing or stale sidecar is rebuilt from the CSV. Without
+    pyarrow, or with DASHBOARD_DATASET_SIDECAR=0, the CSV is always parsed.
+
+    Args:
+        path (str): Path of the CSV written by DatasetAlter.py.
+        stat (os.stat_result, optional): The CSV's stat, if the caller already has it.
+
+    Returns:
+        Tuple[pd.DataFrame, str]: The typed dataset and where it was read from ("sidecar" or "csv").
+    """
+    if feather is None or not USE_DATASET_SIDECAR:
+        return read_dataset_csv(path), "csv"
+
+    if stat is None:
+        stat = os.stat(path)
+    cache_path = sidecar_path(path)
+    try:
+        table = feather.read_table(cache_path, memory_map=True)
+        if (table.schema.metadata or {}).get(SIDECAR_SOURCE_KEY) == sidecar_source(stat):
+            return table.to_pandas(), "sidecar"
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring unreadable dataset sidecar {cache_path}: {e}")
+
+    dataset = read_dataset_csv(path)
+    try:
+        write_sidecar(dataset, cache_path, stat)
+    except Exception as e:
+        print(f"Could not write dataset sidecar {cache_path}: {e}")
+    return dataset, "csv"
+
+
+class CategoryIndex:
+    """
+    Bitmap index over one categorical column.
+
+    Every category code has a packed bitmap (one bit per row) marking the rows
+    holding that category, so a filter becomes an OR/AND over byte arrays instead
+    of a string match over every row.
+    """
+
+    def __init__(self, column):
+        self.categories = [str(value) for value in column.cat.categories]
+        codes = column.cat.codes.to_numpy()
+        self.bitmaps = [np.packbits(codes == code) for code in range(len(self.categories))]
+        self._resolved = LRUCache(RESOLVED_TERMS_CACHE_SIZE)
+
+    def resolve(self, term):
+        """
+        Map a filter string from the LLM to the category codes it selects.
+
+        Matching follows the case-insensitive str.contains the filters used before,
+        but it runs once per category instead of once per row, and the results for the
+        most recently used RESOLVED_TERMS_CACHE_SIZE terms are remembered.
+
+        Args:
+            term (str): The loanType or region value.
+
+        Returns:
+            Tuple[int, ...]: The matching category codes.
+        """
+        key = term.lower()
+        codes = self._resolved.get(key)
+        if codes is None:
+            try:
+                pattern = re.compile(term, re.IGNORECASE)
+            except re.error:
+                pattern = re.compile(re.escape(term), re.IGNORECASE)
+            codes = tuple(code for code, value in enumerate(self.categories) if pattern.search(value))
+            self._resolved.put(key, codes)
+        return codes
+
+    def packed(self, codes, start, end):
+        """
+        OR the bitmaps of the given codes over the bytes covering rows [start, end).
+        """
+        first, last = start // 8, (end + 7) // 8
+        result = np.zeros(last - first, dtype=np.uint8)
+        for code in codes:
+            result |= self.bitmaps[code][first:last]
+        return result
+
+
+def month_number(date):
+    """
+    Number the calendar months consecutively so a month range is an integer range.
+    """
+    return date.year * 12 + date.month - 1
+
+
+class CubeSlice:
+    """
+    The cube cells for one month range and loanType/region filter.
+
+    It stands in for the filtered rows passed to the widgets. preprocess_data() sums
+    the cells instead of grouping the loans, so the cost depends on the number of
+    cells rather than the number of loans. Aggregates grouped by a single
+    PREFIX_SUM_COLUMNS column come from the prefix sums and do not touch the cells.
+    """
+
+    def __init__(self, cube, start_date, end_date, loan_codes, branch_codes):
+        self.cube = cube
+        self.start_date = start_date
+        self.end_date = end_date
+        self.loan_codes = loan_codes
+        self.branch_codes = branch_codes
+        self._cells = None
+
+    @property
+    def cells(self):
+        if self._cells is None:
+            self._cells = self.cube.cells_between(self.start_date, self.end_date, self.loan_codes, self.branch_codes)
+        return self._cells
+
+    @property
+    def empty(self):
+        return self.cells.empty
+
+    def aggregate(self, group_by_columns, aggregation_rules):
+        """
+        Group the cells like preprocess_data() groups the rows.
+
+        Only the aggregations the cube holds are supported: 'count' of 'Customer ID'
+        and 'sum' of the CUBE_MEASURES columns.
+        """
+        for col, rule in aggregation_rules.items():
+            if not ((col == 'Customer ID' and rule == 'count') or (col in CUBE_MEASURES and rule == 'sum')):
+                raise ValueError(f"The cube cannot compute '{rule}' of '{col}'")
+        if len(group_by_columns) == 1 and group_by_columns[0] in self.cube.prefix_sums:
+            prefix_sums = self.cube.prefix_sums[group_by_columns[0]]
+            grouped_data = prefix_sums.aggregate(self.start_date, self.end_date, self.loan_codes, self.branch_codes)
+            return grouped_data[group_by_columns + list(aggregation_rules)]
+
+        sums = {col: 'sum' for col in aggregation_rules}
+        return self.cells.groupby(group_by_columns, observed=True).agg(sums).reset_index()
+
+    def progress_summary(self):
+        """
+        Build the per-branch work-in-progress summary used by progress_status().
+
+        Returns:
+            Tuple[pd.DataFrame, dict, int]: The summary per branch, the number of
+            work-in-progress loans per city, and the number of branches.
+        """
+        wip = self.cells[(self.cells['Process Status'] == 'Work in Progress') & self.cells['Branch'].notna()]
+        branch = wip['Branch'].astype(str)
+        query = wip['Query Type (Only WIP)'].astype(object).str.lower()
+        counts = wip['Customer ID']
+
+        city = branch.str.split('-').str[0].str.strip()
+        branch_counts = counts.groupby(city).sum().to_dict()
+
+        grouped_summary = pd.DataFrame({
+            'Branch': branch,
+            'credit': counts.where(query == 'credit cases', 0),
+            'operational': counts.where(query == 'operational cases', 0),
+            'salesQueries': counts.where(query == 'sales queries', 0),
+            'total': counts.where(query.notna(), 0)
+        }).groupby('Branch', sort=True).sum().reset_index()
+        grouped_summary.insert(1, 'branchManager', grouped_summary['Branch'].map(self.cube.managers))
+
+        return grouped_summary, branch_counts, len(grouped_summary)
+
+
+class StatusPrefixSums:
+    """
+    Running totals per (Loan Type, Branch, status) along a dense month axis.
+
+    counts[m] holds the loan count and totals[m] the amount sums of every month before
+    month m of the axis. Months a..b are then counts[b + 1] - counts[a], and likewise
+    for totals, for a one-month range as for a five-year one. Counts are kept as
+    integers so they come back exact. Loan type and branch codes are shifted by one, so
+    position 0 keeps the rows with no value; a loanType/region filter never
+    selects them.
+    """
+
+    def __init__(self, cube, frame, status_column):
+        self.status_column = status_column
+        self.statuses = [str(value) for value in frame[status_column].cat.categories]
+        self.first_month = int(cube.months.min()) if len(cube.months) else 0
+        self.month_count = int(cube.months.max()) - self.first_month + 1 if len(cube.months) else 0
+
+        cells = cube.cells
+        status_codes = pd.Categorical(cells[status_column], categories=frame[status_column].cat.categories).codes
+        dated = status_codes >= 0
+        amounts = np.column_stack([cells[col].fillna(0).to_numpy(dtype=float) for col in CUBE_MEASURES])
+
+        shape = (
+            self.month_count + 1,
+            len(frame['Loan Type'].cat.categories) + 1,
+            len(frame['Branch'].cat.categories) + 1,
+            len(self.statuses)
+        )
+        cell_positions = (
+            cube.months[dated] - self.first_month + 1,
+            cube.codes['Loan Type'][dated] + 1,
+            cube.codes['Branch'][dated] + 1,
+            status_codes[dated]
+        )
+        monthly_counts = np.zeros(shape, dtype=np.int64)
+        np.add.at(monthly_counts, cell_positions, cells['Customer ID'].to_numpy(dtype=np.int64)[dated])
+        monthly_amounts = np.zeros(shape + (len(CUBE_MEASURES),))
+        np.add.at(monthly_amounts, cell_positions, amounts[dated])
+        self.counts = monthly_counts.cumsum(axis=0)
+        self.totals = monthly_amounts.cumsum(axis=0)
+
+    def aggregate(self, start_date, end_date, loan_codes=None, branch_codes=None):
+        """
+        Sum the months from start_date to end_date per status, like preprocess_data() on the rows.
+
+        Returns:
+            pd.DataFrame: One row per status with loans, holding 'Customer ID' (the loan
+            count) and the CUBE_MEASURES sums.
+        """
+        start = min(max(month_number(start_date) - self.first_month, 0), self.month_count)
+        end = min(max(month_number(end_date) - self.first_month + 1, 0), self.month_count)
+        end = max(end, start)
+
+        def window_sums(running_totals):
+            window = running_totals[end] - running_totals[start]
+            if loan_codes is not None:
+                window = window[[code + 1 for code in loan_codes]]
+            if branch_codes is not None:
+                window = window[:, [code + 1 for code in branch_codes]]
+            return window.sum(axis=(0, 1))
+
+        grouped_data = pd.DataFrame(window_sums(self.totals), columns=CUBE_MEASURES)
+        grouped_data.insert(0, 'Customer ID', window_sums(self.counts))
+        grouped_data.insert(0, self.status_column, self.statuses)
+        return grouped_data[grouped_data['Customer ID'] > 0].reset_index(drop=True)
+
+
+class DatasetCube:
+    """
+    Monthly pre-aggregation of the dataset for the dashboard widgets.
+
+    There is one cell per observed (month, Loan Type, Branch, Process Status,
+    LoanStatus, Query Type) combination. Each cell holds the loan count and the sums of
+    the requested, sanctioned and disbursed amounts. Cells are ordered by month, so a
+    month range is a binary search away.
+    """
+
+    def __init__(self, frame, dated_rows):
+        dated = frame.iloc[:dated_rows]
+        dates = dated['Requested Date']
+        months = (dates.dt.year * 12 + dates.dt.month - 1).rename('month')
+
+        measures = {'Customer ID': ('Customer ID', 'count')}
+        measures.update({col: (col, 'sum') for col in CUBE_MEASURES})
+        cells = dated.groupby([months] + CUBE_DIMENSIONS, observed=True, dropna=False, sort=True).agg(
+            **measures
+        ).reset_index()
+
+        labels = {
+            month: datetime(int(month) // 12, int(month) % 12 + 1, 1).strftime('%b-%Y').upper()
+            for month in cells['month'].unique()
+        }
+        cells['Month'] = cells['month'].map(labels)
+
+        self.cells = cells
+        self.months = cells['month'].to_numpy()
+        self.codes = {
+            col: pd.Categorical(cells[col], categories=frame[col].cat.categories).codes
+            for col in INDEXED_COLUMNS
+        }
+        # A branch always has the same manager, so it does not need to be a dimension
+        self.managers = (
+            dated.groupby('Branch', observed=True)['Manager Name'].first().astype(object)
+            .rename(index=str).to_dict()
+        )
+        # The cube only answers whole days; finer timestamps would cut months in the middle
+        self.daily = bool((dates == dates.dt.normalize()).all())
+        self.prefix_sums = {col: StatusPrefixSums(self, frame, col) for col in PREFIX_SUM_COLUMNS}
+
+    def covers(self, start_date, end_date):
+        """
+        Tell whether a date range is made of whole months, which the cube can answer exactly.
+        """
+        return (
+            self.daily
+            and start_date == datetime(start_date.year, start_date.month, 1)
+            and end_date == datetime(end_date.year, end_date.month, monthrange(end_date.year, end_date.month)[1])
+        )
+
+    def select(self, start_date, end_date, loan_codes=None, branch_codes=None):
+        """
+        Return a CubeSlice for the months from start_date to end_date and the category codes.
+        """
+        return CubeSlice(self, start_date, end_date, loan_codes, branch_codes)
+
+    def cells_between(self, start_date, end_date, loan_codes=None, branch_codes=None):
+        """
+        Return the cells of the months from start_date to end_date that match the category codes.
+        """
+        start = int(self.months.searchsorted(month_number(start_date), side='left'))
+        end = int(self.months.searchsorted(month_number(end_date), side='right'))
+
+        mask = None
+        for col, codes in (("Loan Type", loan_codes), ("Branch", branch_codes)):
+            if codes is None:
+                continue
+            matches = np.isin(self.codes[col][start:end], list(codes))
+            mask = matches if mask is None else mask & matches
+
+        cells = self.cells.iloc[start:end]
+        if mask is not None:
+            cells = cells[mask]
+        return cells
+
+
+class DatasetSnapshot:
+    """
+    One loaded, typed version of the dataset.
+
+    The frame is shared by every request that sees this snapshot, so callers must
+    treat it as read-only and filter into new frames instead of modifying it.
+    """
+
+    def __init__(self, frame, mtime, size, load_seconds, source):
+        frame = sort_by_requested_date(frame)
+        self.frame = frame
+        # Rows are ordered by 'Requested Date' and the undated rows sit at the end,
+        # so the first dated_rows entries of dates form a sorted index.
+        self.dates = frame['Requested Date'].to_numpy()
+        self.dated_rows = int(frame['Requested Date'].notna().sum())
+        self.indexes = {col: CategoryIndex(frame[col]) for col in INDEXED_COLUMNS}
+        self.cube = None
+        if USE_CUBE:
+            try:
+                self.cube = DatasetCube(frame, self.dated_rows)
+            except Exception as e:
+                print(f"Dataset cube not built, widgets will aggregate raw rows: {e}")
+        self.source = source
+        self.mtime = mtime
+        self.size = size
+        self.rows = len(frame)
+        # Identifies the file contents this snapshot was loaded from
+        self.version = f"{mtime}-{size}"
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now()
+
+    def date_range(self, start_date, end_date):
+        """
+        Find the rows requested between two dates (both inclusive) with a binary search.
+
+        Args:
+            start_date (datetime): The first requested date to include.
+            end_date (datetime): The last requested date to include.
+
+        Returns:
+            Tuple[int, int]: The half-open range of row positions.
+        """
+        dates = self.dates[:self.dated_rows]
+        start = dates.searchsorted(pd.Timestamp(start_date).to_datetime64(), side='left')
+        end = dates.searchsorted(pd.Timestamp(end_date).to_datetime64(), side='right')
+        return int(start), int(max(start, end))
+
+    def select(self, start_date, end_date, loan_type=None, region=None):
+        """
+        Return what the widgets aggregate for a date range and loanType/region filter.
+
+        Ranges of whole months are answered from the cube. Any other range gets the raw rows.
+
+        Args:
+            start_date (datetime): The first requested date to include.
+            end_date (datetime): The last requested date to include.
+            loan_type (str, optional): Filter on 'Loan Type', matched like str.contains.
+            region (str, optional): Filter on 'Branch', matched like str.contains.
+
+        Returns:
+            Union[CubeSlice, pd.DataFrame]: The matching cube cells or rows.
+        """
+        if self.cube is not None and self.cube.covers(start_date, end_date):
+            codes = [
+                self.indexes[col].resolve(term) if term is not None else None
+                for col, term in (("Loan Type", loan_type), ("Branch", region))
+            ]
+            return self.cube.select(start_date, end_date, *codes)
+        return self.select_rows(start_date, end_date, loan_type, region)
+
+    def select_rows(self, start_date, end_date, loan_type=None, region=None):
+        """
+        Return the rows requested between two dates, optionally narrowed by loan type and branch.
+
+        Args:
+            start_date (datetime): The first requested date to include.
+            end_date (datetime): The last requested date to include.
+            loan_type (str, optional): Filter on 'Loan Type', matched like str.contains.
+            region (str, optional): Filter on 'Branch', matched like str.contains.
+
+        Returns:
+            pd.DataFrame: The matching rows.
+        """
+        start, end = self.date_range(start_date, end_date)
+
+        packed = None
+        for col, term in (("Loan Type", loan_type), ("Branch", region)):
+            if term is None:
+                continue
+            index = self.indexes[col]
+            bits = index.packed(index.resolve(term), start, end)
+            packed = bits if packed is None else packed & bits
+
+        if packed is None:
+            return self.frame.iloc[start:end]
+
+        offset = start % 8
+        mask = np.unpackbits(packed)[offset:offset + end - start].astype(bool)
+        return self.frame.take(np.flatnonzero(mask) + start)
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "loadSeconds": round(self.load_seconds, 4),
+            "source": self.source,
+            "cubeCells": len(self.cube.cells) if self.cube is not None else None,
+            "loadedAt": self.loaded_at.isoformat(timespec="seconds"),
+            "fileSize": self.size,
+            "fileModified": datetime.fromtimestamp(self.mtime / 1e9).isoformat(timespec="seconds")
+        }
+
+
+class DatasetStore:
+    """
+    Process-wide holder of the dataset.
+
+    The CSV is parsed once and the typed frame is handed out to every request.
+    It is loaded again only when the file's modification time or size changes, and
+    every callable in reload_listeners is then called so caches built on the old
+    contents can be dropped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.loads = 0
+        self.reload_listeners = []
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _is_current(self, snapshot, stat):
+        return snapshot is not None and (snapshot.mtime, snapshot.size) == (stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        """
+        Return the current snapshot, reloading the file first if it changed on disk.
+
+        Returns:
+            DatasetSnapshot: The snapshot matching the file on disk.
+        """
+        snapshot = self._snapshot
+        if self._is_current(snapshot, os.stat(self.path)):
+            return snapshot
+
+        with self._lock:
+            stat = os.stat(self.path)
+            snapshot = self._snapshot
+            if not self._is_current(snapshot, stat):
+                started = time.perf_counter()
+                with timed("dataset_load"):
+                    frame, source = load_dataset(self.path, stat)
+                with timed("snapshot_build"):
+                    snapshot = DatasetSnapshot(frame, stat.st_mtime_ns, stat.st_size, time.perf_counter() - started, source)
+                self._snapshot = snapshot
+                self.loads += 1
+                print(f"Dataset loaded from {source}: {snapshot.rows} rows in {snapshot.load_seconds:.3f}s")
+                for listener in self.reload_listeners:
+                    listener()
+        return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        result = {"path": self.path, "loaded": snapshot is not None, "loads": self.loads}
+        if snapshot is not None:
+            result.update(snapshot.stats())
+        return result
+
+
+dataset_store = DatasetStore(DATASET_PATH)
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with optional per-entry expiry.
+
+    Hits and misses are counted so the cache's effect can be checked on /stats.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None when it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        """
+        Return the cached value for key like get(), without counting a hit or a miss.
+
+        For re-checking a key whose lookup has already been counted.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return entry[0]
+            return None
+
+    def put(self, key, value, expires_at=None):
+        """
+        Store a value, evicting the least recently used entries beyond max_entries.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            expires_at (float, optional): Unix time after which the entry is ignored.
+        """
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class Counters:
+    """
+    A set of named, thread-safe counters.
+    """
+
+    def __init__(self, *names):
+        self._values = dict.fromkeys(names, 0)
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. A caller asking for a key that is already
+    being computed waits for that call and shares its result, or its exception, instead
+    of starting a second one.
+
+    Args:
+        enabled (bool): When False every caller runs its own call.
+        timeout (float, optional): Seconds a waiting caller gives the shared call before
+            it raises TimeoutError, so a hung call does not hold the waiting threads.
+    """
+
+    def __init__(self, enabled=True, timeout=None):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.counts = Counters("calls", "coalesced")
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        if not self.enabled:
+            return function(*args)
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            self.counts.increment("coalesced")
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise FutureTimeoutError(f"Timed out after {self.timeout}s waiting for the shared call") from None
+
+        self.counts.increment("calls")
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        counts = self.counts.snapshot()
+        requests = counts["calls"] + counts["coalesced"]
+        counts["coalescedRatio"] = round(counts["coalesced"] / requests, 4) if requests else 0.0
+        return counts
+
+
+QUERY_CACHE_SIZE = int(os.environ.get("DASHBOARD_QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get("DASHBOARD_QUERY_CACHE_TTL", "3600"))
+
+query_cache = LRUCache(QUERY_CACHE_SIZE)
+
+# Set DASHBOARD_QUERY_FAST_PATH=0 to send every uncached query to the LLM.
+USE_QUERY_FAST_PATH = os.environ.get("DASHBOARD_QUERY_FAST_PATH", "1") != "0"
+
+query_parse_counts = Counters("fastPath", "llm")
+
+# Set DASHBOARD_WIDGET_EXECUTION=sequential to build the dashboard widgets one after another.
+WIDGET_EXECUTION = os.environ.get("DASHBOARD_WIDGET_EXECUTION", "concurrent")
+WIDGET_MAX_WORKERS = int(os.environ.get("DASHBOARD_WIDGET_WORKERS", "16"))
+WIDGET_TIMEOUT_SECONDS = float(os.environ.get("DASHBOARD_WIDGET_TIMEOUT", "60"))
+
+widget_executor = ThreadPoolExecutor(max_workers=WIDGET_MAX_WORKERS, thread_name_prefix="widget")
+
+# Set DASHBOARD_SINGLE_FLIGHT=0 to stop identical concurrent requests from sharing one
+# query parse and one build of each widget.
+USE_SINGLE_FLIGHT = os.environ.get("DASHBOARD_SINGLE_FLIGHT", "1") != "0"
+
+# LLM query parses keyed like the query cache, widget builds keyed like the widget cache.
+# Waiting callers give up after WIDGET_TIMEOUT_SECONDS, as widgets do in iter_widgets().
+query_flights = SingleFlight(USE_SINGLE_FLIGHT, WIDGET_TIMEOUT_SECONDS)
+widget_flights = SingleFlight(USE_SINGLE_FLIGHT, WIDGET_TIMEOUT_SECONDS)
+
+WIDGET_CACHE_SIZE = int(os.environ.get("DASHBOARD_WIDGET_CACHE_SIZE", "512"))
+
+# Widget bodies keyed by (dataset version, filter fingerprint, widget key)
+widget_cache = LRUCache(WIDGET_CACHE_SIZE)
+dataset_store.reload_listeners.append(widget_cache.clear)
+
+# How many prompts of one widget (the progress_status chunks) are sent to the LLM at the same time.
+PROGRESS_STATUS_CONCURRENCY = int(os.environ.get("DASHBOARD_PROGRESS_CONCURRENCY", "4"))
+
+# Widgets rendered locally instead of by the LLM, e.g. "case_status,categories" or "all".
+LOCAL_WIDGETS = {
+    widget.strip() for widget in os.environ.get("DASHBOARD_LOCAL_WIDGETS", "").split(",") if widget.strip()
+}
+
+# How widget data is written into LLM prompts: "records" (one JSON object per row),
+# "columns" (the column names once, then one JSON array per row) or "csv". Either one
+# encoding for every widget or per widget, e.g. "records,loan_summary=csv". Run
+# benchmark.py to compare their token counts.
+def parse_prompt_encodings(setting):
+    encodings = {}
+    for item in setting.split(","):
+        widget, _, encoding = item.strip().rpartition("=")
+        if encoding:
+            encodings[widget or "*"] = encoding
+    return encodings
+
+PROMPT_ENCODINGS = parse_prompt_encodings(
+    os.environ.get("DASHBOARD_PROMPT_ENCODING", "records")
+)
+
+PROMPT_ENCODING_NOTES = {
+    "records": "",
+    "columns": ' (JSON: the column names in "columns", then one array of values per row in "data")',
+    "csv": " (CSV with a header row)"
+}
+
+# Prompts and prompt tokens sent per widget
+prompt_token_counts = Counters()
+
 def preprocess_data(dataset, group_by_columns, aggregation_rules, column_renames=None, conversion_columns=None, conversion_rate=1):
     """
     Preprocess the dataset by grouping and aggregating data.
 
     Args:
-        dataset (pd.DataFrame): The input dataset.
+        dataset (Union[pd.DataFrame, CubeSlice]): The input rows, or the cube cells standing in for them.
         group_by_columns (list): Columns to group by.
         aggregation_rules (dict): Aggregation rules.
         column_renames (dict, optional): Columns to rename.
@@ -35,7 +998,10 @@ def preprocess_data(dataset, group_by_columns, aggregation_rules, column_renames
     Returns:
         pd.DataFrame: The processed dataset.
     """
-    grouped_data = dataset.groupby(group_by_columns).agg(aggregation_rules).reset_index()
+    if isinstance(dataset, CubeSlice):
+        grouped_data = dataset.aggregate(group_by_columns, aggregation_rules)
+    else:
+        grouped_data = dataset.groupby(group_by_columns, observed=True).agg(aggregation_rules).reset_index()
 
     if column_renames:
         grouped_data.rename(columns=column_renames, inplace=True)
@@ -49,11 +1015,11 @@ def preprocess_data(dataset, group_by_columns, aggregation_rules, column_renames
 
 
 
-def prompt(safe_data_string, question, formatted_response):
+def prompt(safe_data_string, question, formatted_response, data_note=""):
     return f"""
     You are given the following processed loan data and a question. Use the data to answer the question in the exact JSON format provided below.
 
-    Processed Loan Data:
+    Processed Loan Data{data_note}:
     {safe_data_string}
 
     Question:
@@ -77,40 +1043,103 @@ def subtract_months(date, months):
         year -= 1
     return datetime(year, month, 1)
 
-def ask_question(processed_data, question, formatt):
-    data_string = processed_data.to_json(orient="records")
-    safe_data_string = json.dumps(json.loads(data_string))
+LLM_SYSTEM_PROMPT = "You are an assistant that analyzes loan data."
+QUERY_SYSTEM_PROMPT = "You are an assistant that extracts and formats data for loan analytics."
+
+def chat_completion_args(user_prompt, system_prompt=LLM_SYSTEM_PROMPT):
+    """
+    Build the chat completion request shared by the sync and async LLM clients.
+    """
+    return dict(
+        model='gpt-4o-2',
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.5,
+        max_tokens=4000
+    )
+
+def complete_chat(user_prompt, system_prompt=LLM_SYSTEM_PROMPT, call=""):
+    started = time.perf_counter()
     try:
-        completion = llm.chat.completions.create(             
-            model='gpt-4o-2',            
-            messages=[                 
-                {"role": "system", 
-                 "content": "You are an assistant that analyzes loan data."
-                 },                 
-                {
-                    "role": "user",
-                    "content": prompt(safe_data_string, question, formatt)
-                }            
-            ],             
-            temperature=0.5,             
-            max_tokens=4000         
-        )
-        response = completion.choices[0].message.content
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.endswith("```"):
-            response = response[:-3]
+        completion = llm.chat.completions.create(**chat_completion_args(user_prompt, system_prompt))
+    except Exception:
+        llm_requests.inc(call=call, outcome="error")
+        raise
+    record_completion(call, completion, time.perf_counter() - started)
+    return completion.choices[0].message.content
+
+def strip_json_fence(response):
+    if response.startswith("```json"):
+        response = response[7:]
+    if response.endswith("```"):
+        response = response[:-3]
+    return response.strip()
+
+def parse_answer(response):
+    try:
+        return json.loads(strip_json_fence(response))
+    except json.JSONDecodeError as e:
+        return {"error": "Invalid JSON format in response", "details": str(e)}
 
-        response = response.strip()
+def prompt_encoding(widget):
+    encoding = PROMPT_ENCODINGS.get(widget, PROMPT_ENCODINGS.get("*", "records"))
+    return encoding if encoding in PROMPT_ENCODING_NOTES else "records"
 
-        try:
-            response_json = json.loads(response)
-            return response_json
-        except json.JSONDecodeError as e:
-            return {"error": "Invalid JSON format in response", "details": str(e)}
+def encode_data(processed_data, encoding="records"):
+    """
+    Write a processed frame into prompt text in one of the PROMPT_ENCODING_NOTES encodings.
+    """
+    if encoding == "columns":
+        return processed_data.to_json(orient="split", index=False)
+    if encoding == "csv":
+        return processed_data.to_csv(index=False).strip()
+    return processed_data.to_json(orient="records")
+
+@lru_cache(maxsize=1)
+def token_encoder():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
 
+def count_tokens(text):
+    """
+    Count the tokens of a prompt with tiktoken's gpt-4o encoding, or estimate them at
+    4 characters per token when tiktoken is not installed.
+    """
+    encoder = token_encoder()
+    if encoder is None:
+        return len(text) // 4
+    return len(encoder.encode(text, disallowed_special=()))
+
+def record_prompt_tokens(widget, encoding, user_prompt):
+    """
+    Log and count the tokens of a widget prompt that is about to be sent.
+    """
+    widget = widget or "other"
+    tokens = count_tokens(user_prompt)
+    prompt_token_counts.increment(f"{widget}:prompts")
+    prompt_token_counts.increment(f"{widget}:tokens", tokens)
+    print(f"{widget} prompt: {tokens} tokens as {encoding}")
+
+def question_prompt(processed_data, question, formatt, widget=None):
+    encoding = prompt_encoding(widget)
+    user_prompt = prompt(encode_data(processed_data, encoding), question, formatt, PROMPT_ENCODING_NOTES[encoding])
+    record_prompt_tokens(widget, encoding, user_prompt)
+    return user_prompt
+
+def answer_prompt(user_prompt, call=""):
+    try:
+        return parse_answer(complete_chat(user_prompt, call=call))
     except Exception as e:
         return {"error": "Failed to get completion from Azure OpenAI", "details": str(e)}
+
+def ask_question(processed_data, question, formatt):
+    return answer_prompt(question_prompt(processed_data, question, formatt))
     
 
 def format_date_range(start_date_str, end_date_str):
@@ -140,8 +1169,244 @@ def format_date_range(start_date_str, end_date_str):
 
     
 ##############################################################################################
+# Local renderers: build the same JSON the LLM is asked for, straight from the aggregates.
+
+LOAN_TYPE_KEYS = {
+    "Housing Loan": "HOUSING_LOAN",
+    "Vehicle Loan": "VEHICLE_LOAN",
+    "Education Loan": "EDUCATIONAL_LOAN",
+    "Personal Loan": "PERSONAL_LOAN",
+    "Gold Loan": "GOLD_LOAN",
+    "Loan Against Property": "LOAN_AGAINST_PROPERTY",
+    "Business Loan": "BUSINESS_LOAN"
+}
+
+# (Process Status, status key, color, amount column) in the order the bar chart shows them
+CASE_STATUS_STYLES = [
+    ("Work in Progress", "WORK_IN_PROGRESS", "#7E3BF0", "sanctioned_amount_usd"),
+    ("Sanctioned", "SANCTIONED", "#B0AFFF", "sanctioned_amount_usd"),
+    ("Disbursed", "DISBURSED", "#3B39F0", "disbursed_amount_usd")
+]
+
+# (dataKey, fill, label, Loan Type) for the category selector
+CATEGORY_STYLES = [
+    ("HOUSING_LOAN", "#962DFF", "Housing Loan", "Housing Loan"),
+    ("VEHICLE_LOAN", "#4A3AFF", "Vehicle Loan", "Vehicle Loan"),
+    ("EDUCATIONAL_LOAN", "#E0C6FD", "Educational Loan", "Education Loan"),
+    ("PERSONAL_LOAN", "#D2DCFE", "Personal Loan", "Personal Loan"),
+    ("GOLD_LOAN", "#7A47B4", "Gold Loan", "Gold Loan"),
+    ("LOAN_AGAINST_PROPERTY", "#4B66C5", "Loan Against Property", "Loan Against Property")
+]
+
+# (subTitle, LoanStatus, whether an increase is good)
+LOAN_PROCESSING_METRICS = [
+    ("Approval Rate", "Approved", True),
+    ("Denial Rate", "Denied", False),
+    ("Submission Cancelled", "Cancelled", False)
+]
+
+
+def renders_locally(widget):
+    """
+    Tell whether a widget is configured to skip the LLM and use its local renderer.
+    """
+    return "all" in LOCAL_WIDGETS or widget in LOCAL_WIDGETS
 
-def case_status(dataset):
+
+def format_percentage(value):
+    return f"{round(float(value), 2):g}%"
+
+
+def percentages_of_total(values):
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    total = values.sum()
+    if not total:
+        return np.zeros_like(values)
+    return np.round(values / total * 100, 2)
+
+
+def render_case_status(processed_data):
+    """
+    Render the caseStatusForBarchart widget from the case_status aggregates.
+
+    Work in progress and sanctioned cases are measured by their sanctioned amount and
+    disbursed cases by their disbursed amount, all in USD.
+    """
+    data = processed_data.set_index(processed_data['Process Status'].astype(str)).reindex(
+        [style[0] for style in CASE_STATUS_STYLES]
+    )
+    amounts = np.nan_to_num(np.where(
+        [style[3] == "disbursed_amount_usd" for style in CASE_STATUS_STYLES],
+        data['disbursed_amount_usd'].to_numpy(dtype=float),
+        data['sanctioned_amount_usd'].to_numpy(dtype=float)
+    ))
+    cases = data['cases'].fillna(0).to_numpy(dtype=int)
+    fill = percentages_of_total(amounts)
+
+    return {
+        "caseStatusForBarchart": {
+            "total": [
+                {
+                    "status": status,
+                    "amount": round(float(amount), 2),
+                    "caseCount": int(count),
+                    "fillColor_percentage": float(percentage),
+                    "color": color
+                }
+                for (_, status, color, _), amount, count, percentage in zip(CASE_STATUS_STYLES, amounts, cases, fill)
+            ]
+        }
+    }
+
+
+def render_progress_status(grouped_summary):
+    """
+    Render the progressStatus widget from the per-branch summary built by progress_status.
+    """
+    items = grouped_summary.rename(columns={'Branch': 'branch'})[
+        ['branch', 'branchManager', 'operational', 'credit', 'salesQueries', 'total']
+    ].astype({'operational': int, 'credit': int, 'salesQueries': int, 'total': int})
+
+    return {
+        "progressStatus": {
+            "commonTitle": "Progress Status",
+            "items": json.loads(items.to_json(orient="records"))
+        }
+    }
+
+
+def render_loan_processing(processed_data_1, processed_data_2):
+    """
+    Render the Loan Processing metrics for the selected window against the previous one.
+
+    Rates are the share of cases per LoanStatus. diffValue is the percentage change
+    ((new - old) / old) * 100, shown green when it moves the good way.
+    """
+    statuses = [metric[1] for metric in LOAN_PROCESSING_METRICS]
+
+    def status_rates(processed_data):
+        cases = processed_data.set_index(processed_data['LoanStatus'].astype(str))['Total_cases']
+        total = cases.sum()
+        if not total:
+            return np.zeros(len(statuses))
+        return cases.reindex(statuses).fillna(0).to_numpy(dtype=float) / total * 100
+
+    current = status_rates(processed_data_1)
+    previous = status_rates(processed_data_2)
+    change = np.divide(current - previous, previous, out=np.zeros_like(current), where=previous > 0) * 100
+
+    items = []
+    for (title, _, increase_is_good), value, diff in zip(LOAN_PROCESSING_METRICS, current, change):
+        improved = diff >= 0 if increase_is_good else diff <= 0
+        items.append({
+            "subTitle": title,
+            "value": format_percentage(value),
+            "diffValue": format_percentage(abs(diff)),
+            "color": "green" if improved else "red",
+            "direction": "up" if diff >= 0 else "down"
+        })
+
+    return {"metrics": {"commonTitle": "Loan Processing", "items": items}}
+
+
+def render_categories(grouped_data, time_period, loan_type):
+    """
+    Render the category selector with each loan type's share of the cases.
+    """
+    percentages = grouped_data.set_index(grouped_data['Loan Type'].astype(str))['percentage'].reindex(
+        [style[3] for style in CATEGORY_STYLES]
+    ).fillna(0)
+
+    selected = (loan_type or "").lower()
+    category_keys = [
+        {
+            "dataKey": data_key,
+            "fill": fill,
+            "label": label,
+            "percentageValue": format_percentage(percentage),
+            "selected": selected in (label.lower(), name.lower())
+        }
+        for (data_key, fill, label, name), percentage in zip(CATEGORY_STYLES, percentages)
+    ]
+    category_keys.insert(0, {
+        "dataKey": "ALL_CATEGORIES",
+        "fill": "#4A3AFF",
+        "label": "All Categories",
+        "selected": not any(category["selected"] for category in category_keys)
+    })
+
+    return {"timePeriod": time_period, "subCategories": loan_type, "categoryKeyArr": category_keys}
+
+
+def render_loan_summary(processed_data):
+    """
+    Render the barChart widget from the Loan Type x Month aggregates.
+
+    Months are listed in calendar order, and a loan type is left out of a month that
+    has no cases for it.
+    """
+    loan_types = processed_data['Loan Type'].astype(str)
+    data = processed_data.assign(
+        key=loan_types.map(LOAN_TYPE_KEYS).fillna(loan_types.str.upper().str.replace(' ', '_')),
+        period=pd.to_datetime(processed_data['Month'], format='%b-%Y')
+    )
+    data = data[data['total_cases'] > 0].sort_values(['period', 'key'])
+
+    chart_details = []
+    for _, rows in data.groupby('period', sort=True):
+        entry = {"name": rows['Month'].iloc[0]}
+        for key, cases, amount in zip(rows['key'], rows['total_cases'], rows['total_amount'].fillna(0)):
+            entry[key] = {"cases": int(cases), "amount": round(float(amount), 2)}
+        chart_details.append(entry)
+
+    return {
+        "barChart": {
+            "barChartLeftLbl": "Total Logged In Cases",
+            "barChartRightLbl": "Total Loan Amount",
+            "barChartRightValue": round(float(data['total_amount'].fillna(0).sum()), 2),
+            "barChartLeftValue": int(data['total_cases'].sum()),
+            "chartDetails": chart_details
+        }
+    }
+
+
+##############################################################################################
+# Widgets: each prepare_* function does the pandas work and returns a WidgetWork, which
+# complete_widget() (or the async server) finishes by asking the LLM.
+
+class WidgetWork:
+    """
+    A widget whose data is ready.
+
+    Either body is the finished JSON (the widget rendered locally), or prompts holds
+    what to ask the LLM and merge turns the parsed answers, in prompt order, into the
+    widget's JSON.
+    """
+
+    def __init__(self, body=None, prompts=(), merge=None):
+        self.body = body
+        self.prompts = list(prompts)
+        self.merge = merge or (lambda answers: answers[0])
+
+
+def complete_widget(work, key=""):
+    """
+    Finish a widget on the calling thread.
+
+    Widgets with several prompts send at most PROGRESS_STATUS_CONCURRENCY of them to
+    the LLM at a time. key labels the widget's LLM calls in the metrics.
+    """
+    if work.body is not None:
+        return work.body
+    if len(work.prompts) == 1:
+        return work.merge([answer_prompt(work.prompts[0], key)])
+
+    workers = max(1, min(PROGRESS_STATUS_CONCURRENCY, len(work.prompts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="widget-prompt") as executor:
+        return work.merge(list(executor.map(lambda user_prompt: answer_prompt(user_prompt, key), work.prompts)))
+
+
+def prepare_case_status(dataset):
     group_by = ['Process Status']
     aggregations = {
         'Customer ID': 'count',
@@ -164,459 +1429,816 @@ def case_status(dataset):
         conversion_columns=conversion_cols, 
         conversion_rate=conversion_rate
     )
+    if renders_locally("case_status"):
+        return WidgetWork(body=render_case_status(processed_data))
+
+    question = """
+        Summarize the loan cases by process status. For each status, provide the following details:
+        - status: The process status (e.g., "WORK_IN_PROGRESS", "SANCTIONED", "DISBURSED").
+        - amount: The total amount for the status.
+        - caseCount: The count of cases for the status.
+        - fillColor_percentage: The percentage of the total amount represented by this status. It should always same as in the formatt.
+        - color: A color code associated with the status. It should always same as in the formatt.
+
+        Provide the result in the specified JSON format.
+    """
+    formatt = """
+    {
+        "caseStatusForBarchart": {
+            "total": [
+                {
+                    "status": "WORK_IN_PROGRESS",
+                    "amount": 1489348.00,
+                    "caseCount": 1,
+                    "fillColor_percentage": 21.23,
+                    "color": "#7E3BF0"
+                },
+                {
+                    "status": "SANCTIONED",
+                    "amount": 1626610.00,
+                    "caseCount": 2,
+                    "fillColor_percentage": 23.19,
+                    "color":"#B0AFFF"
+                },
+                {
+                    "status": "DISBURSED",
+                    "amount": 3610340.00,
+                    "caseCount": 3,
+                    "fillColor_percentage": 55.58,
+                    "color":"#3B39F0"
+                }
+            ]
+        }
+    }
+    """
+    return WidgetWork(prompts=[question_prompt(processed_data, question, formatt, "case_status")])
+
+
+def case_status(dataset):
     try:
-        question = """
-            Summarize the loan cases by process status. For each status, provide the following details:
-            - status: The process status (e.g., "WORK_IN_PROGRESS", "SANCTIONED", "DISBURSED").
-            - amount: The total amount for the status.
-            - caseCount: The count of cases for the status.
-            - fillColor_percentage: The percentage of the total amount represented by this status. It should always same as in the formatt.
-            - color: A color code associated with the status. It should always same as in the formatt.
+        return jsonify(complete_widget(prepare_case_status(dataset)))
+    except Exception as e:
+        return jsonify({"error": str(e)})
+    
 
-            Provide the result in the specified JSON format.
-        """
-        formatt = """
-        {
-            "caseStatusForBarchart": {
-                "total": [
-                    {
-                        "status": "WORK_IN_PROGRESS",
-                        "amount": 1489348.00,
-                        "caseCount": 1,
-                        "fillColor_percentage": 21.23,
-                        "color": "#7E3BF0"
-                    },
-                    {
-                        "status": "SANCTIONED",
-                        "amount": 1626610.00,
-                        "caseCount": 2,
-                        "fillColor_percentage": 23.19,
-                        "color":"#B0AFFF"
-                    },
-                    {
-                        "status": "DISBURSED",
-                        "amount": 3610340.00,
-                        "caseCount": 3,
-                        "fillColor_percentage": 55.58,
-                        "color":"#3B39F0"
-                    }
-                ]
-            }
+##############################################################################################
+
+
+def summarize_progress(dataset):
+    """
+    Build the per-branch work-in-progress summary from the raw rows.
+
+    Returns:
+        Tuple[pd.DataFrame, dict, int]: The summary per branch, the number of
+        work-in-progress loans per city, and the number of branches.
+    """
+    data = dataset[dataset['Process Status'] == 'Work in Progress']
+    data['Query Type (Only WIP)'] = data['Query Type (Only WIP)'].str.lower()
+
+    # Calculate the total branches per city
+    data['City'] = data['Branch'].str.split('-').str[0].str.strip()
+    branch_counts = data['City'].value_counts().to_dict()
+
+    grouped_summary = data.groupby('Branch', observed=True).apply(lambda x: pd.Series({
+        'branchManager': x['Manager Name'].iloc[0],
+        'credit': (x['Query Type (Only WIP)'] == 'credit cases').sum(),
+        'operational': (x['Query Type (Only WIP)'] == 'operational cases').sum(),
+        'salesQueries': (x['Query Type (Only WIP)'] == 'sales queries').sum(),
+        'total': x['Query Type (Only WIP)'].count()
+    })).reset_index()
+    grouped_summary['Branch'] = grouped_summary['Branch'].astype(str)
+
+    # Check if there are multiple branches in the dataset
+    total_branches = len(data['Branch'].unique())
+
+    return grouped_summary, branch_counts, total_branches
+
+
+def prepare_progress_status(dataset):
+    if isinstance(dataset, CubeSlice):
+        grouped_summary, branch_counts, total_branches = dataset.progress_summary()
+    else:
+        grouped_summary, branch_counts, total_branches = summarize_progress(dataset)
+
+    # Update branch names to include total branch count only if there are multiple branches in the dataset
+    grouped_summary['Branch'] = grouped_summary['Branch'].apply(
+        lambda x: f"{x.split('-')[0].strip()} - {branch_counts.get(x.split('-')[0].strip(), 1)}" 
+        if total_branches > 1 else x.split('-')[0].strip()
+    )
+
+    grouped_summary = grouped_summary.sort_values(by='total', ascending=False).reset_index(drop=True)
+
+    if renders_locally("progress_status"):
+        return WidgetWork(body=render_progress_status(grouped_summary))
+
+    chunk_size = 65
+    chunks = [grouped_summary[i:i + chunk_size] for i in range(0, len(grouped_summary), chunk_size)]
+
+    question = """
+    Summarize the loan data by branch name and branch manager. The response must be in strict JSON format without any errors. Include the total operational cases, credit cases, sales queries, and the total for each branch.
+    The JSON should include an array of objects, each representing a branch with the following properties:
+
+    1. "branch" (string): The city name and number of branches in that city.
+    2. "branchManager" (string): The name of the branch manager.
+    3. "operational" (integer): The total number of operational cases.
+    4. "credit" (integer): The total number of credit cases.
+    5. "salesQueries" (integer): The total number of sales queries.
+    6. "total" (integer): The sum of operational, credit, and sales queries for the branch.
+
+    Ensure that the response is always valid JSON and strictly adheres to the above format.
+    """
+    formatt = """
+    {
+        "progressStatus": {
+            "commonTitle": "Progress Status",
+            "items" : [
+                {
+                    "branch": "Mumbai - 10",
+                    "branchManager": "Jane Doe",
+                    "operational": 56000,
+                    "credit": 31000,
+                    "salesQueries": 100,
+                    "total": 87100
+                },
+                {
+                    "branch": "Chennai - 01",
+                    "branchManager": "Jane Doe",
+                    "operational": 0,
+                    "credit": 60000,
+                    "salesQueries": 98,
+                    "total": 60098
+                },
+                {
+                    "branch": "Coimbatore - 02",
+                    "branchManager": "Jane Doe",
+                    "operational": 80000,
+                    "credit": 25000,
+                    "salesQueries": 32,
+                    "total": 105032
+                }
+            ]
         }
+    }
     """
-        
-        analysis_result = ask_question(processed_data, question, formatt)
+    return WidgetWork(
+        prompts=[question_prompt(chunk, question, formatt, "progress_status") for chunk in chunks],
+        merge=merge_progress_status
+    )
 
+
+def merge_progress_status(answers):
+    """
+    Combine the answers for the progress_status chunks into one branch list.
+    """
+    # Every chunk must come back for the branch list to be complete
+    items = []
+    for analysis_result in answers:
         if isinstance(analysis_result, dict) and 'error' in analysis_result:
-            return jsonify(analysis_result)
-        
-        return jsonify(analysis_result)
+            return analysis_result
+        try:
+            items.extend(analysis_result['progressStatus']['items'])
+        except (KeyError, TypeError):
+            return {"error": f"Unexpected progress status chunk: {json.dumps(analysis_result)}"}
 
+    items.sort(key=lambda item: item.get('total', 0), reverse=True)
+    return {"progressStatus": {"commonTitle": "Progress Status", "items": items}}
+
+
+def progress_status(dataset):
+    try:
+        return jsonify(complete_widget(prepare_progress_status(dataset)))
     except Exception as e:
         return jsonify({"error": str(e)})
     
-
 ##############################################################################################
 
+def prepare_loan_processing(dataset_1, dataset_2):
+    group_by = ['LoanStatus']
+    aggregations = {
+        'Customer ID': 'count',
+        'Loan Amount Requested': 'sum'
+    }
+    rename_map = {
+        'Customer ID': 'Total_cases',
+        'Loan Amount Requested': 'Total_amount'
+    }
+
+    # Preprocess the datasets
+    processed_data_1 = preprocess_data(
+        dataset=dataset_1, 
+        group_by_columns=group_by, 
+        aggregation_rules=aggregations, 
+        column_renames=rename_map
+    )
+    processed_data_2 = preprocess_data(
+        dataset=dataset_2, 
+        group_by_columns=group_by, 
+        aggregation_rules=aggregations, 
+        column_renames=rename_map
+    )
+
+    if renders_locally("loan_processing"):
+        return WidgetWork(body=render_loan_processing(processed_data_1, processed_data_2))
 
-def progress_status(dataset):
+    question = """
+        Analyze the two datasets provided (dataset_1 and dataset_2) and calculate the metrics "Approval Rate," "Denial Rate," and "Submission Canceled". Return only the values. No need of returning calculations.
+
+        For each metric:
+        1. Calculate the percentage for both datasets.
+        2. Determine the percentage change between the two datasets. Use the formula: 
+        Percentage Change = ((New - Old) / Old) * 100.
+        3. For "Approval Rate," if the percentage increases, mark the status as "Positive"; if it decreases, mark it as "Negative."
+        4. For "Denial Rate" and "Submission Canceled," if the percentage decreases, mark the status as "Positive"; if it increases, mark it as "Negative."
+    """
+    formatt = """
+    {
+        "metrics" : {
+            "commonTitle": "Loan Processing",
+            "items": [
+                {
+                "subTitle": "Approval Rate",
+                "value": "82%",
+                "diffValue": "1.5%",
+                "color": "red",
+                "direction":"down"
+                },
+                {
+                "subTitle": "Denial Rate",
+                "value": "22.5%",
+                "diffValue": "2.1%",
+                "color": "green",
+                "direction":"up"
+                },
+                {
+                "subTitle": "Submission Cancelled",
+                "value": "32%",
+                "diffValue": "1.5%",
+                "color": "red",
+                "direction":"down"
+                }
+            ]
+        }
+    }
+    """
+    def datasets_prompt(encoding):
+        return f"""
+        You are given the following processed loan datasets and a question. Use the datasets to answer the question in the exact JSON format provided below.
+
+        Processed Loan Data{PROMPT_ENCODING_NOTES[encoding]}:
+        dataset_1:
+        {encode_data(processed_data_1, encoding)}
+
+        dataset_2:
+        {encode_data(processed_data_2, encoding)}
+
+        Question:
+        {question}
+
+        Format the response strictly in this JSON format:
+        {formatt}
+
+        Answer:
+    """
+
+    encoding = prompt_encoding("loan_processing")
+    user_prompt = datasets_prompt(encoding)
+    record_prompt_tokens("loan_processing", encoding, user_prompt)
+    return WidgetWork(prompts=[user_prompt])
+
+
+def loan_processing(dataset_1, dataset_2):
     try:
-        data = dataset[dataset['Process Status'] == 'Work in Progress']
-        data['Query Type (Only WIP)'] = data['Query Type (Only WIP)'].str.lower()
-
-        # Calculate the total branches per city
-        data['City'] = data['Branch'].str.split('-').str[0].str.strip()
-        branch_counts = data['City'].value_counts().to_dict()
-
-        grouped_summary = data.groupby('Branch').apply(lambda x: pd.Series({
-            'branchManager': x['Manager Name'].iloc[0],
-            'credit': (x['Query Type (Only WIP)'] == 'credit cases').sum(),
-            'operational': (x['Query Type (Only WIP)'] == 'operational cases').sum(),
-            'salesQueries': (x['Query Type (Only WIP)'] == 'sales queries').sum(),
-            'total': x['Query Type (Only WIP)'].count()
-        })).reset_index()
-
-        # Check if there are multiple branches in the dataset
-        total_branches = len(data['Branch'].unique())
-
-        # Update branch names to include total branch count only if there are multiple branches in the dataset
-        grouped_summary['Branch'] = grouped_summary['Branch'].apply(
-            lambda x: f"{x.split('-')[0].strip()} - {branch_counts.get(x.split('-')[0].strip(), 1)}" 
-            if total_branches > 1 else x.split('-')[0].strip()
-        )
+        return jsonify(complete_widget(prepare_loan_processing(dataset_1, dataset_2)))
+    except Exception as e:
+        return jsonify({"error": str(e)})
 
-        grouped_summary = grouped_summary.sort_values(by='total', ascending=False).reset_index(drop=True)
 
-        chunk_size = 65
-        chunks = [grouped_summary[i:i + chunk_size] for i in range(0, len(grouped_summary), chunk_size)]
 
-        all_results = []
 
-        question = """
-        Summarize the loan data by branch name and branch manager. The response must be in strict JSON format without any errors. Include the total operational cases, credit cases, sales queries, and the total for each branch.
-        The JSON should include an array of objects, each representing a branch with the following properties:
 
-        1. "branch" (string): The city name and number of branches in that city.
-        2. "branchManager" (string): The name of the branch manager.
-        3. "operational" (integer): The total number of operational cases.
-        4. "credit" (integer): The total number of credit cases.
-        5. "salesQueries" (integer): The total number of sales queries.
-        6. "total" (integer): The sum of operational, credit, and sales queries for the branch.
+##############################################################################################
 
-        Ensure that the response is always valid JSON and strictly adheres to the above format.
-        """
-        formatt = """
-        {
-            "progressStatus": {
-                "commonTitle": "Progress Status",
-                "items" : [
-                    {
-                        "branch": "Mumbai - 10",
-                        "branchManager": "Jane Doe",
-                        "operational": 56000,
-                        "credit": 31000,
-                        "salesQueries": 100,
-                        "total": 87100
-                    },
-                    {
-                        "branch": "Chennai - 01",
-                        "branchManager": "Jane Doe",
-                        "operational": 0,
-                        "credit": 60000,
-                        "salesQueries": 98,
-                        "total": 60098
-                    },
-                    {
-                        "branch": "Coimbatore - 02",
-                        "branchManager": "Jane Doe",
-                        "operational": 80000,
-                        "credit": 25000,
-                        "salesQueries": 32,
-                        "total": 105032
-                    }
-                ]
-            }
-        }
-        """
 
-        for chunk in chunks:
-            analysis_result = ask_question(chunk, question, formatt)
-            all_results.append(analysis_result)
-        
-        combined_result = json.dumps(all_results)
-       
-        try:
-            final_result = json.loads(combined_result)
-            return jsonify(final_result[0])
-        except json.JSONDecodeError as e:
-            return jsonify({"error": f"JSON Decode Error: {str(e)} - Combined result: {combined_result}"})
 
+def prepare_categories(dataset, time_period, loan_type):
+    group_by = ['Loan Type']
+    aggregations = {
+        'Customer ID': 'count'
+    }
+    rename_map = {
+        'Customer ID': 'Total_cases'
+    }
+
+    grouped_data = preprocess_data(
+        dataset=dataset, 
+        group_by_columns=group_by, 
+        aggregation_rules=aggregations, 
+        column_renames=rename_map
+    )
+    
+    total_count = grouped_data['Total_cases'].sum()
+    grouped_data['percentage'] = (grouped_data['Total_cases'] / total_count) * 100
+    grouped_data['percentage'] = grouped_data['percentage'].round(2)
+
+    if renders_locally("categories"):
+        return WidgetWork(body=render_categories(grouped_data, time_period, loan_type))
+
+    # subCategory = ""
+    percentages = {
+        "allCategories": 0,
+        "housingLoan": 0,
+        "vehicleLoan": 0,
+        "educationalLoan": 0,
+        "personalLoan": 0,
+        "goldLoan": 0,
+        "loanAgainstProperty": 0
+    }
+
+    # if loan_type.lower() == "retail loan":
+    #     subCategory = "allCategories"
+    #     percentages = grouped_data.set_index('Loan Type')['percentage'].to_dict()
+    # else:
+    #     subCategory = loan_type.lower()
+    #     for loan in percentages.keys():
+    #         percentages[loan] = grouped_data.loc[grouped_data['Loan Type'].str.lower() == subCategory, 'percentage'].sum() if loan == subCategory else 0
+
+    question = f"""
+        Format the loan data into a JSON structure where each loan type's name is a key, and the values are calculated by finding the percentage of the total count.
+        Strictly follow the format of dataKey. Add "timePeriod": "{time_period}" and "subCategories": "{loan_type}" at the top level.
+        Ensure that the response includes a "selected" field for each category, which is true for the subCategory and false for others.
+
+        Rules:
+        1. Each loan type's name should be a key in the JSON structure.
+        2. The value for each key should be the percentage of the total count.
+        3. Add "timePeriod": "{time_period}" at the top level.
+        4. Add "subCategories": "{loan_type}" at the top level.
+        5. Include a "selected" field for each category:
+        - Set "selected" to true for the subCategory.
+        - Set "selected" to false for all other categories.
+        6. Ensure the response is always valid JSON and strictly adheres to the format.
+    """
+
+    formatt = f"""
+    {{
+        "categoryKeyArr": [
+        {{"dataKey": "ALL_CATEGORIES", "fill": "#4A3AFF", "label": "All Categories", "selected": true}},
+        {{"dataKey": "HOUSING_LOAN", "fill": "#962DFF", "label": "Housing Loan", "percentageValue": "{percentages.get('housingLoan', 0)}%", "selected": false}},
+        {{"dataKey": "VEHICLE_LOAN", "fill": "#4A3AFF", "label": "Vehicle Loan", "percentageValue": "{percentages.get('vehicleLoan', 0)}%", "selected": false}},
+        {{"dataKey": "EDUCATIONAL_LOAN", "fill": "#E0C6FD", "label": "Educational Loan", "percentageValue": "{percentages.get('educationalLoan', 0)}%", "selected": false}},
+        {{"dataKey": "PERSONAL_LOAN", "fill": "#D2DCFE", "label": "Personal Loan", "percentageValue": "{percentages.get('personalLoan', 0)}%", "selected": false}},
+        {{"dataKey": "GOLD_LOAN", "fill": "#7A47B4", "label": "Gold Loan", "percentageValue": "{percentages.get('goldLoan', 0)}%", "selected": false}},
+        {{"dataKey": "LOAN_AGAINST_PROPERTY", "fill": "#4B66C5", "label": "Loan Against Property", "percentageValue": "{percentages.get('loanAgainstProperty', 0)}%", "selected": false}}
+        ]
+    }}
+    """
+    return WidgetWork(prompts=[question_prompt(grouped_data, question, formatt, "categories")])
+
+
+def categories(dataset,time_period,loan_type):
+    try:
+        return jsonify(complete_widget(prepare_categories(dataset, time_period, loan_type)))
     except Exception as e:
         return jsonify({"error": str(e)})
     
-##############################################################################################
+##############################################################################################
+
+ 
+def prepare_loan_summary(dataset):
+    # Define the question and expected format
+    question = """
+    Summarize the loan data grouped by Loan Type, Year, and Month. Strictly include the total number of logged-in cases and total amount sanctioned, and format the results for a bar chart.
+    The JSON should include:
+    - "barChartLeftLbl": Label for the left side of the bar chart.
+    - "barChartRightLbl": Label for the right side of the bar chart.
+    - "barChartRightValue": Total loan amount.
+    - "barChartLeftValue": Total number of logged-in cases. It should be correct values.
+    - "chartDetails": An array of objects, each representing a month with the following properties:
+        - "name": The month and year (e.g., "JAN-2024").
+        - For each loan type (e.g., "HOUSING_LOAN", "GOLD_LOAN"), include:
+        - "cases": The total number of cases. If number of cases is 0, then don't add the loanType in response (ex: if number of cases is 0 for education loan , then don't show "EDUCATIONAL_LOAN" in response)
+        - "amount": The total loan amount.
+
+    Ensure that the response is always valid JSON and strictly adheres to the above format.
+    """
+    format_template = """
+    {
+        "barChart": {
+            "barChartLeftLbl": "Total Logged In Cases",
+            "barChartRightLbl": "Total Loan Amount",
+            "barChartRightValue": 12563000,
+            "barChartLeftValue": 32000,
+            "chartDetails": [
+                {
+                    "name": "JAN-2024",
+                    "HOUSING_LOAN": { "cases": 111, "amount": 111 },
+                    "GOLD_LOAN": { "cases": 111, "amount": 111 },
+                    "LOAN_AGAINST_PROPERTY": { "cases": 111, "amount": 111 },
+                    "VEHICLE_LOAN": { "cases": 111, "amount": 111 },
+                    "EDUCATIONAL_LOAN": { "cases": 111, "amount": 111 }, 
+                    "PERSONAL_LOAN": { "cases": 111, "amount": 111 }
+                },
+                { "name": "FEB-2024", 
+                    "HOUSING_LOAN": { "cases": 111, "amount": 111 },
+                    "GOLD_LOAN": { "cases": 111, "amount": 111 },
+                    "LOAN_AGAINST_PROPERTY": { "cases": 111, "amount": 111 },
+                    "VEHICLE_LOAN": { "cases": 111, "amount": 111 },
+                    "EDUCATIONAL_LOAN": { "cases": 111, "amount": 111 }, 
+                    "PERSONAL_LOAN": { "cases": 111, "amount": 111 }
+                },
+                { 
+                    "name": "MAR-2024", 
+                    "HOUSING_LOAN": { "cases": 111, "amount": 111 },
+                    "GOLD_LOAN": { "cases": 111, "amount": 111 },
+                    "LOAN_AGAINST_PROPERTY": { "cases": 111, "amount": 111 },
+                    "VEHICLE_LOAN": { "cases": 111, "amount": 111 },
+                    "EDUCATIONAL_LOAN": { "cases": 111, "amount": 111 }, 
+                    "PERSONAL_LOAN": { "cases": 111, "amount": 111 }
+                }
+            ]
+        }
+    }
+    """
+    
+    # Cube cells already carry their month
+    if not isinstance(dataset, CubeSlice):
+        requested_dates = pd.to_datetime(dataset['Requested Date'])
+        dataset = dataset.assign(
+            Year=requested_dates.dt.year,
+            Month=requested_dates.dt.strftime('%b-%Y').str.upper()
+        )
 
-def loan_processing(dataset_1, dataset_2):
-    group_by = ['LoanStatus']
+    group_by_columns = ['Loan Type', 'Month']
     aggregations = {
         'Customer ID': 'count',
-        'Loan Amount Requested': 'sum'
+        'Loan Amount Sanctioned': 'sum'
     }
     rename_map = {
-        'Customer ID': 'Total_cases',
-        'Loan Amount Requested': 'Total_amount'
+        'Customer ID': 'total_cases',
+        'Loan Amount Sanctioned': 'total_amount'
     }
 
-    # Preprocess the datasets
-    processed_data_1 = preprocess_data(
-        dataset=dataset_1, 
-        group_by_columns=group_by, 
-        aggregation_rules=aggregations, 
-        column_renames=rename_map
-    )
-    processed_data_2 = preprocess_data(
-        dataset=dataset_2, 
-        group_by_columns=group_by, 
-        aggregation_rules=aggregations, 
+    processed_data = preprocess_data(
+        dataset=dataset,
+        group_by_columns=group_by_columns,
+        aggregation_rules=aggregations,
         column_renames=rename_map
     )
 
+    if renders_locally("loan_summary"):
+        return WidgetWork(body=render_loan_summary(processed_data))
+
+    return WidgetWork(prompts=[question_prompt(processed_data, question, format_template, "loan_summary")])
+
+
+def loan_summary(dataset):
     try:
-        question = """
-            Analyze the two datasets provided (dataset_1 and dataset_2) and calculate the metrics "Approval Rate," "Denial Rate," and "Submission Canceled". Return only the values. No need of returning calculations.
+        return jsonify(complete_widget(prepare_loan_summary(dataset)))
+    except Exception as e:
+        return jsonify({"error": str(e)})
+    
 
-            For each metric:
-            1. Calculate the percentage for both datasets.
-            2. Determine the percentage change between the two datasets. Use the formula: 
-            Percentage Change = ((New - Old) / Old) * 100.
-            3. For "Approval Rate," if the percentage increases, mark the status as "Positive"; if it decreases, mark it as "Negative."
-            4. For "Denial Rate" and "Submission Canceled," if the percentage decreases, mark the status as "Positive"; if it increases, mark it as "Negative."
-        """
-        formatt = """
-        {
-            "metrics" : {
-                "commonTitle": "Loan Processing",
-                "items": [
-                    {
-                    "subTitle": "Approval Rate",
-                    "value": "82%",
-                    "diffValue": "1.5%",
-                    "color": "red",
-                    "direction":"down"
-                    },
-                    {
-                    "subTitle": "Denial Rate",
-                    "value": "22.5%",
-                    "diffValue": "2.1%",
-                    "color": "green",
-                    "direction":"up"
-                    },
-                    {
-                    "subTitle": "Submission Cancelled",
-                    "value": "32%",
-                    "diffValue": "1.5%",
-                    "color": "red",
-                    "direction":"down"
-                    }
-                ]
-            }
-        }
-        """
-        prompt = f"""
-            You are given the following processed loan datasets and a question. Use the datasets to answer the question in the exact JSON format provided below.
+##############################################################################################
 
-            Processed Loan Data:
-            {processed_data_1.to_dict(orient='records')}, {processed_data_2.to_dict(orient='records')}
 
-            Question:
-            {question}
+##############################################################################################
+# Rule-based query parsing: the common cases of the date-extraction prompt, without the LLM.
 
-            Format the response strictly in this JSON format:
-            {formatt}
+MONTH_PATTERN = (
+    r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+MONTH_NUMBERS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+QUARTER_ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+
+# (granularity, pattern); the first rule that matches the query decides its dates
+QUERY_DATE_RULES = [
+    ("range", re.compile(
+        rf"\b(?:from\s+|between\s+)?{MONTH_PATTERN}\s*[-,/']?\s*(\d{{4}})\s*(?:to|till|until|and|-)\s*"
+        rf"{MONTH_PATTERN}\s*[-,/']?\s*(\d{{4}})\b"
+    )),
+    ("quarter_year_first", re.compile(r"\b(\d{4})\s*-?\s*q([1-4])\b")),
+    ("quarter", re.compile(r"\bq([1-4])\b(?:\s*(?:of\s+|,\s*|-\s*|')?\s*(\d{4})\b)?")),
+    ("quarter_ordinal", re.compile(r"\b(first|1st|second|2nd|third|3rd|fourth|4th)\s+quarter\b(?:\s*(?:of\s+)?(\d{4})\b)?")),
+    ("month", re.compile(rf"\b{MONTH_PATTERN}\s*[-,/']?\s*(\d{{4}})\b")),
+    ("relative", re.compile(r"\b(this|current|last|previous)\s+(month|quarter|year)\b")),
+    ("year", re.compile(r"\b(\d{4})\b"))
+]
+
+# Date-like words left over after the matched phrase mean the query is not one of the common forms
+AMBIGUOUS_DATE_WORDS = re.compile(
+    rf"\b(?:\d{{4}}|\d{{1,2}}[/-]\d{{1,2}}|{MONTH_PATTERN}|q[1-4]|quarters?|months?|years?|weeks?|days?"
+    r"|today|yesterday|tomorrow|ytd|mtd|qtd|fy\d*|fiscal|half|h[12]|since|till|until|before|after|ago"
+    r"|next|past|last|previous|recent|annual(?:ly)?|quarterly|monthly|weekly|daily)\b"
+)
 
-            Answer:
-        """
-        
-        completion = llm.chat.completions.create(             
-            model='gpt-4o-2',            
-            messages=[                 
-                {"role": "system", 
-                 "content": "You are an assistant that analyzes loan data."
-                 },                 
-                {
-                    "role": "user",
-                    "content": prompt
-                }            
-            ],             
-            temperature=0.5,             
-            max_tokens=4000         
-        )
-        response = completion.choices[0].message.content
-        
-        # Clean up the response
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.endswith("```"):
-            response = response[:-3]
+# (pattern, loanType, status) for loan types named in a query
+QUERY_LOAN_TYPES = [
+    (re.compile(r"\b(?:home|housing|house)\b"), "Housing Loan", "housingLoan"),
+    (re.compile(r"\b(?:car|bike|vehicle|vehicles|two[- ]wheeler)\b"), "Vehicle Loan", "vehicleLoan"),
+    (re.compile(r"\bloan\s*against\s*property\b|\bloanagainstproperty\b"), "Loan Against Property", "loanAgainstProperty"),
+    (re.compile(r"\bgold\b"), "Gold Loan", "goldLoan"),
+    (re.compile(r"\b(?:education|educational|student)\b"), "Education Loan", "educationalLoan"),
+    (re.compile(r"\bpersonal\b"), "Personal Loan", "personalLoan"),
+    (re.compile(r"\bbusiness\b"), "Business Loan", "businessLoan")
+]
+# Words that can come before "loan(s)" without naming a loan type
+GENERIC_LOAN_WORDS = {
+    "all", "retail", "total", "the", "of", "my", "our", "new", "any", "many", "much", "number", "count",
+    "approved", "denied", "cancelled", "canceled", "disbursed", "sanctioned", "pending", "open", "active",
+    "show", "for", "and", "in", "what", "which", "these", "those", "logged", "logged-in",
+    "india", "pan-india"
+}
+REGION_WORDS = re.compile(r"\b(?:branch|branches|region|regions|city|cities|state|states|zone|zones|district)\b")
+PAN_INDIA_WORDS = re.compile(r"\bpan[- ]?india\b|\ball\s+(?:branches|regions|india)\b")
+
+
+def month_bounds(year, month, months=1):
+    """
+    Return the first day of a month and the last day of the month `months - 1` later.
+    """
+    end_year, end_month = divmod(year * 12 + month - 1 + months - 1, 12)
+    end_month += 1
+    return (
+        datetime(year, month, 1),
+        datetime(end_year, end_month, monthrange(end_year, end_month)[1])
+    )
 
-        response = response.strip()
-        
-        try:
-            response_json = json.loads(response)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON format in LLM response: {e}")
 
-        return jsonify(response_json)
-        
-    except Exception as e:
-        return jsonify({"error": str(e)})
+def extract_query_dates(text, today):
+    """
+    Find the date range named in a normalized query, following rules 1 and 2 of the prompt.
+
+    Returns:
+        Tuple[datetime, datetime, str] or None: Start, end and granularity ("month",
+        "quarter", "year" or "range"), or None when the dates are not in a supported form.
+    """
+    for rule, pattern in QUERY_DATE_RULES:
+        matches = list(pattern.finditer(text))
+        if not matches:
+            continue
+        if len(matches) > 1:
+            return None
+        match = matches[0]
+        if AMBIGUOUS_DATE_WORDS.search(text[:match.start()] + " " + text[match.end():]):
+            return None
+        groups = match.groups()
+
+        if rule == "range":
+            start, _ = month_bounds(int(groups[1]), MONTH_NUMBERS[groups[0][:3]])
+            _, end = month_bounds(int(groups[3]), MONTH_NUMBERS[groups[2][:3]])
+            if end < start:
+                return None
+            return start, end, "range"
+        if rule in ("quarter", "quarter_ordinal"):
+            quarter = int(groups[0]) if rule == "quarter" else QUARTER_ORDINALS[groups[0]]
+            year = int(groups[1]) if groups[1] else today.year
+            return (*month_bounds(year, quarter * 3 - 2, 3), "quarter")
+        if rule == "quarter_year_first":
+            return (*month_bounds(int(groups[0]), int(groups[1]) * 3 - 2, 3), "quarter")
+        if rule == "month":
+            return (*month_bounds(int(groups[1]), MONTH_NUMBERS[groups[0][:3]]), "month")
+        if rule == "relative":
+            shift = 0 if groups[0] in ("this", "current") else 1
+            if groups[1] == "month":
+                year, month = divmod(today.year * 12 + today.month - 1 - shift, 12)
+                return (*month_bounds(year, month + 1), "month")
+            if groups[1] == "quarter":
+                quarter_start = today.year * 12 + (today.month - 1) // 3 * 3 - 3 * shift
+                year, month = divmod(quarter_start, 12)
+                return (*month_bounds(year, month + 1, 3), "quarter")
+            return (*month_bounds(today.year - shift, 1, 12), "year")
+        year = int(groups[0])
+        if not 1990 <= year <= 2100:
+            return None
+        return (*month_bounds(year, 1, 12), "year")
+
+    if AMBIGUOUS_DATE_WORDS.search(text):
+        return None
+    return (*month_bounds(today.year, today.month), "month")
+
+
+def adjust_to_time_period(start, end, granularity, timePeriod):
+    """
+    Apply the timePeriod picked in the UI to the extracted dates (rule 3 of the prompt).
+
+    Returns:
+        Tuple[datetime, datetime] or None: The adjusted range, or None when the rule is ambiguous.
+    """
+    if not timePeriod:
+        return start, end
+    if granularity == "range":
+        return None
+    if timePeriod == "monthly":
+        return month_bounds(start.year, start.month)
+    if timePeriod == "quarterly":
+        if granularity == "year":
+            return month_bounds(start.year, 1, 3)
+        return month_bounds(start.year, (start.month - 1) // 3 * 3 + 1, 3)
+    if timePeriod == "annually":
+        return month_bounds(start.year, 1, 12)
+    return None
+
+
+def resolve_query_loan_type(text, category):
+    """
+    Apply rules 4 and 5 of the prompt.
+
+    Returns:
+        Tuple[str, str] or None: loanType and status, or None when the query names a
+        loan type the rules do not cover or names more than one.
+    """
+    if category:
+        if category.lower() == "all categories":
+            return "retailLoan", "allcategories"
+        return category, category
+
+    matches = [(loan_type, status) for pattern, loan_type, status in QUERY_LOAN_TYPES if pattern.search(text)]
+    if len(matches) > 1:
+        return None
+    if matches:
+        return matches[0]
+    if any(word not in GENERIC_LOAN_WORDS for word in re.findall(r"([a-z-]+)\s+loans?\b", text)):
+        return None
+    return "retailLoan", "allcategories"
+
+
+def known_cities():
+    """
+    Return the branch cities in the dataset, or None when the dataset cannot be loaded.
+    """
+    try:
+        branches = dataset_store.get().indexes['Branch'].categories
+    except Exception:
+        return None
+    return {branch.split('-')[0].strip() for branch in branches}
+
+
+def resolve_query_region(text):
+    """
+    Find the branch city named in the query, defaulting to "Pan India".
+
+    Returns:
+        str or None: The region, or None when it cannot be decided without the LLM.
+    """
+    cities = known_cities()
+    if not cities:
+        return None
+    found = [city for city in cities if re.search(rf"\b{re.escape(city.lower())}\b", text)]
+    if len(found) > 1:
+        return None
+    if found:
+        return found[0]
+    if REGION_WORDS.search(text) and not PAN_INDIA_WORDS.search(text):
+        return None
+    return "Pan India"
+
+
+def parse_query_locally(query_text, category, timePeriod, today):
+    """
+    Resolve a query with the rules of the date-extraction prompt, without calling the LLM.
 
+    Handles explicit months, quarters, years and month ranges, "this/last
+    month/quarter/year", the timePeriod adjustment, loan types named in the query and
+    branch cities. Anything outside that grammar returns None and is sent to the LLM.
 
+    Args:
+        query_text (str): The user's query.
+        category (str, optional): The category picked in the UI.
+        timePeriod (str, optional): The time period picked in the UI.
+        today (datetime): The default date.
 
+    Returns:
+        dict or None: The structured query in the LLM's response format, or None.
+    """
+    text = " ".join(str(query_text or "").lower().split())
+
+    extracted = extract_query_dates(text, today)
+    if extracted is None:
+        return None
+    start, end, granularity = extracted
+
+    adjusted = adjust_to_time_period(start, end, granularity, timePeriod)
+    if adjusted is None:
+        return None
+    start, end = adjusted
+
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    time_period = {1: "monthly", 3: "quarterly", 12: "annually"}.get(months)
+    if time_period is None:
+        return None
+
+    loan = resolve_query_loan_type(text, category)
+    if loan is None:
+        return None
+    region = resolve_query_region(text)
+    if region is None:
+        return None
+
+    return {
+        "startDate": start.strftime("%Y-%m-%d"),
+        "endDate": end.strftime("%Y-%m-%d"),
+        "region": region,
+        "loanType": loan[0],
+        "queryType": "logged-in cases",
+        "status": loan[1],
+        "timePeriod": time_period
+    }
 
 
 ##############################################################################################
 
+def query_cache_key(query_text, category, timePeriod, default_date):
+    """
+    Build the query cache key: the query with case and spacing normalized, plus every
+    other input of the date-extraction prompt.
+    """
+    normalized_query = " ".join(str(query_text or "").lower().split())
+    return (normalized_query, category, timePeriod, default_date)
 
 
-def categories(dataset,time_period,loan_type):
-    try:
-        
-        group_by = ['Loan Type']
-        aggregations = {
-            'Customer ID': 'count'
-        }
-        rename_map = {
-            'Customer ID': 'Total_cases'
-        }
+def api_ask_question(query_text, category=None, timePeriod=None):
+    """
+    Resolve a dashboard query into dates, region, loan type, status and time period.
 
-        grouped_data = preprocess_data(
-            dataset=dataset, 
-            group_by_columns=group_by, 
-            aggregation_rules=aggregations, 
-            column_renames=rename_map
-        )
-        
-        total_count = grouped_data['Total_cases'].sum()
-        grouped_data['percentage'] = (grouped_data['Total_cases'] / total_count) * 100
-        grouped_data['percentage'] = grouped_data['percentage'].round(2)
-
-        # subCategory = ""
-        percentages = {
-            "allCategories": 0,
-            "housingLoan": 0,
-            "vehicleLoan": 0,
-            "educationalLoan": 0,
-            "personalLoan": 0,
-            "goldLoan": 0,
-            "loanAgainstProperty": 0
-        }
+    Common phrasings are resolved by parse_query_locally(); only the rest go to the
+    LLM, and identical queries arriving while one is being parsed wait for that parse.
+    Answers are cached per day. Relative phrases such as "this month" depend on the
+    current date, so every entry expires at midnight, or after
+    QUERY_CACHE_TTL_SECONDS if that comes first. Failed parses are not cached.
 
-        # if loan_type.lower() == "retail loan":
-        #     subCategory = "allCategories"
-        #     percentages = grouped_data.set_index('Loan Type')['percentage'].to_dict()
-        # else:
-        #     subCategory = loan_type.lower()
-        #     for loan in percentages.keys():
-        #         percentages[loan] = grouped_data.loc[grouped_data['Loan Type'].str.lower() == subCategory, 'percentage'].sum() if loan == subCategory else 0
-
-        question = f"""
-            Format the loan data into a JSON structure where each loan type's name is a key, and the values are calculated by finding the percentage of the total count.
-            Strictly follow the format of dataKey. Add "timePeriod": "{time_period}" and "subCategories": "{loan_type}" at the top level.
-            Ensure that the response includes a "selected" field for each category, which is true for the subCategory and false for others.
-
-            Rules:
-            1. Each loan type's name should be a key in the JSON structure.
-            2. The value for each key should be the percentage of the total count.
-            3. Add "timePeriod": "{time_period}" at the top level.
-            4. Add "subCategories": "{loan_type}" at the top level.
-            5. Include a "selected" field for each category:
-            - Set "selected" to true for the subCategory.
-            - Set "selected" to false for all other categories.
-            6. Ensure the response is always valid JSON and strictly adheres to the format.
-        """
-
-        formatt = f"""
-        {{
-            "categoryKeyArr": [
-            {{"dataKey": "ALL_CATEGORIES", "fill": "#4A3AFF", "label": "All Categories", "selected": true}},
-            {{"dataKey": "HOUSING_LOAN", "fill": "#962DFF", "label": "Housing Loan", "percentageValue": "{percentages.get('housingLoan', 0)}%", "selected": false}},
-            {{"dataKey": "VEHICLE_LOAN", "fill": "#4A3AFF", "label": "Vehicle Loan", "percentageValue": "{percentages.get('vehicleLoan', 0)}%", "selected": false}},
-            {{"dataKey": "EDUCATIONAL_LOAN", "fill": "#E0C6FD", "label": "Educational Loan", "percentageValue": "{percentages.get('educationalLoan', 0)}%", "selected": false}},
-            {{"dataKey": "PERSONAL_LOAN", "fill": "#D2DCFE", "label": "Personal Loan", "percentageValue": "{percentages.get('personalLoan', 0)}%", "selected": false}},
-            {{"dataKey": "GOLD_LOAN", "fill": "#7A47B4", "label": "Gold Loan", "percentageValue": "{percentages.get('goldLoan', 0)}%", "selected": false}},
-            {{"dataKey": "LOAN_AGAINST_PROPERTY", "fill": "#4B66C5", "label": "Loan Against Property", "percentageValue": "{percentages.get('loanAgainstProperty', 0)}%", "selected": false}}
-            ]
-        }}
-        """
-        
-        analysis_result = ask_question(grouped_data, question, formatt)
+    Args:
+        query_text (str): The user's query.
+        category (str, optional): The category picked in the UI.
+        timePeriod (str, optional): The time period picked in the UI.
 
-        # print("  ")
-        # print("############################################################################")
-        # print("  ")
-        # print(analysis_result)
+    Returns:
+        dict: The structured query, or an error dictionary.
+    """
+    key, today, response_data = lookup_query(query_text, category, timePeriod)
+    if response_data is None:
+        response_data = dict(query_flights.do(key, parse_and_remember_query, key, query_text, category, timePeriod, today))
+    return response_data
 
-        if isinstance(analysis_result, dict) and 'error' in analysis_result:
-            return jsonify(analysis_result)
-        
-        return jsonify(analysis_result)
 
-    except Exception as e:
-        return jsonify({"error": str(e)})
-    
-##############################################################################################
+def parse_and_remember_query(key, query_text, category, timePeriod, today):
+    # Runs once per shared parse, so coalesced callers are not counted as LLM parses
+    query_parse_counts.increment("llm")
+    response_data = parse_query_with_llm(query_text, category, timePeriod, today)
+    remember_query(key, today, response_data)
+    return response_data
 
- 
-def loan_summary(dataset):
-    try:
-        # Define the question and expected format
-        question = """
-        Summarize the loan data grouped by Loan Type, Year, and Month. Strictly include the total number of logged-in cases and total amount sanctioned, and format the results for a bar chart.
-        The JSON should include:
-        - "barChartLeftLbl": Label for the left side of the bar chart.
-        - "barChartRightLbl": Label for the right side of the bar chart.
-        - "barChartRightValue": Total loan amount.
-        - "barChartLeftValue": Total number of logged-in cases. It should be correct values.
-        - "chartDetails": An array of objects, each representing a month with the following properties:
-            - "name": The month and year (e.g., "JAN-2024").
-            - For each loan type (e.g., "HOUSING_LOAN", "GOLD_LOAN"), include:
-            - "cases": The total number of cases. If number of cases is 0, then don't add the loanType in response (ex: if number of cases is 0 for education loan , then don't show "EDUCATIONAL_LOAN" in response)
-            - "amount": The total loan amount.
-
-        Ensure that the response is always valid JSON and strictly adheres to the above format.
-        """
-        format_template = """
-        {
-            "barChart": {
-                "barChartLeftLbl": "Total Logged In Cases",
-                "barChartRightLbl": "Total Loan Amount",
-                "barChartRightValue": 12563000,
-                "barChartLeftValue": 32000,
-                "chartDetails": [
-                    {
-                        "name": "JAN-2024",
-                        "HOUSING_LOAN": { "cases": 111, "amount": 111 },
-                        "GOLD_LOAN": { "cases": 111, "amount": 111 },
-                        "LOAN_AGAINST_PROPERTY": { "cases": 111, "amount": 111 },
-                        "VEHICLE_LOAN": { "cases": 111, "amount": 111 },
-                        "EDUCATIONAL_LOAN": { "cases": 111, "amount": 111 }, 
-                        "PERSONAL_LOAN": { "cases": 111, "amount": 111 }
-                    },
-                    { "name": "FEB-2024", 
-                        "HOUSING_LOAN": { "cases": 111, "amount": 111 },
-                        "GOLD_LOAN": { "cases": 111, "amount": 111 },
-                        "LOAN_AGAINST_PROPERTY": { "cases": 111, "amount": 111 },
-                        "VEHICLE_LOAN": { "cases": 111, "amount": 111 },
-                        "EDUCATIONAL_LOAN": { "cases": 111, "amount": 111 }, 
-                        "PERSONAL_LOAN": { "cases": 111, "amount": 111 }
-                    },
-                    { 
-                        "name": "MAR-2024", 
-                        "HOUSING_LOAN": { "cases": 111, "amount": 111 },
-                        "GOLD_LOAN": { "cases": 111, "amount": 111 },
-                        "LOAN_AGAINST_PROPERTY": { "cases": 111, "amount": 111 },
-                        "VEHICLE_LOAN": { "cases": 111, "amount": 111 },
-                        "EDUCATIONAL_LOAN": { "cases": 111, "amount": 111 }, 
-                        "PERSONAL_LOAN": { "cases": 111, "amount": 111 }
-                    }
-                ]
-            }
-        }
-        """
-        
-        dataset['Year'] = pd.to_datetime(dataset['Requested Date']).dt.year
-        dataset['Month'] = pd.to_datetime(dataset['Requested Date']).dt.strftime('%b-%Y').str.upper()
 
-        group_by_columns = ['Loan Type', 'Month']
-        aggregations = {
-            'Customer ID': 'count',
-            'Loan Amount Sanctioned': 'sum'
-        }
-        rename_map = {
-            'Customer ID': 'total_cases',
-            'Loan Amount Sanctioned': 'total_amount'
-        }
+def lookup_query(query_text, category, timePeriod):
+    """
+    Answer a query from the cache or the rule-based parser, without the LLM.
 
-        processed_data = preprocess_data(
-            dataset=dataset,
-            group_by_columns=group_by_columns,
-            aggregation_rules=aggregations,
-            column_renames=rename_map
-        )
+    Returns:
+        Tuple[tuple, datetime, Optional[dict]]: The cache key, the date the query was
+        resolved against, and the structured query, or None when the LLM is needed.
+    """
+    today = datetime.now()
+    key = query_cache_key(query_text, category, timePeriod, today.strftime("%Y-%m-%d"))
+    cached = query_cache.get(key)
+    if cached is not None:
+        return key, today, dict(cached)
 
-        analysis_result = ask_question(processed_data, question, format_template)
+    response_data = None
+    if USE_QUERY_FAST_PATH:
+        with timed("query_fast_path"):
+            response_data = parse_query_locally(query_text, category, timePeriod, today)
+    if response_data is None:
+        return key, today, None
 
-        return jsonify(analysis_result)
+    query_parse_counts.increment("fastPath")
+    remember_query(key, today, response_data)
+    return key, today, response_data
 
-    except Exception as e:
-        return jsonify({"error": str(e)})
-    
 
-##############################################################################################
+def remember_query(key, today, response_data):
+    """
+    Cache a parsed query until midnight, or for QUERY_CACHE_TTL_SECONDS if that comes first.
+    """
+    if isinstance(response_data, dict) and not any("error" in field for field in response_data):
+        midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+        expires_at = min(time.time() + QUERY_CACHE_TTL_SECONDS, midnight.timestamp())
+        query_cache.put(key, dict(response_data), expires_at=expires_at)
 
 
-def api_ask_question(query_text, category=None, timePeriod=None):
+def parse_query_with_llm(query_text, category, timePeriod, today):
+    try:
+        with timed("query_llm"):
+            response = complete_chat(query_prompt(query_text, category, timePeriod, today), QUERY_SYSTEM_PROMPT, "query")
+        return read_query_answer(response)
+    except ValueError as date_error:
+        return query_date_fallback(today, date_error)
+    except Exception as e:
+        return {"error from the LLM": str(e)}
+
+
+def query_prompt(query_text, category, timePeriod, today):
     formatt = """
         {
             "startDate": "Oct 2024",
@@ -628,7 +2250,6 @@ def api_ask_question(query_text, category=None, timePeriod=None):
             "timePeriod": "quarterly"
         }
     """
-    today = datetime.now()
     default_date = today.strftime("%Y-%m-%d")
     print(timePeriod)
     prompt = f"""
@@ -718,57 +2339,191 @@ def api_ask_question(query_text, category=None, timePeriod=None):
     Answer:
     """
 
+    return prompt
 
-    try:
-        completion = llm.chat.completions.create(
-            model="gpt-4o-2",
-            messages=[{"role": "system", "content": "You are an assistant that extracts and formats data for loan analytics."},
-                      {"role": "user", "content": prompt}],
-            temperature=0.5,
-            max_tokens=4000
-        )
-        response = completion.choices[0].message.content
 
-        # Extract JSON from the response
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.endswith("```"):
-            response = response[:-3]
+def read_query_answer(response):
+    """
+    Parse the LLM's answer to query_prompt(), raising ValueError when it has no usable dates.
+    """
+    # Extract JSON from the response
+    if response.startswith("```json"):
+        response = response[7:]
+    if response.endswith("```"):
+        response = response[:-3]
 
-        response_data = json.loads(response)
+    response_data = json.loads(response)
 
-        # Validate and fix dates
-        start_date = response_data.get("startDate", "").strip()
-        end_date = response_data.get("endDate", "").strip()
+    # Validate and fix dates
+    start_date = response_data.get("startDate", "").strip()
+    end_date = response_data.get("endDate", "").strip()
 
-        if not start_date or not end_date:
-            raise ValueError("Missing or invalid startDate/endDate in response.")
+    if not start_date or not end_date:
+        raise ValueError("Missing or invalid startDate/endDate in response.")
 
-        return response_data
+    return response_data
 
-    except ValueError as date_error:
-        # Provide fallback for invalid dates
-        current_month = today.strftime("%b")
-        current_year = today.strftime("%Y")
-        return {
-            "startDate": f"{current_month} 01, {current_year}",
-            "endDate": f"{current_month} 31, {current_year}",
-            "error": f"Date parsing failed: {str(date_error)}"
-        }
-    except Exception as e:
-        return {"error from the LLM": str(e)}
+
+def query_date_fallback(today, date_error):
+    # Provide fallback for invalid dates
+    current_month = today.strftime("%b")
+    current_year = today.strftime("%Y")
+    return {
+        "startDate": f"{current_month} 01, {current_year}",
+        "endDate": f"{current_month} 31, {current_year}",
+        "error": f"Date parsing failed: {str(date_error)}"
+    }
+
+
+
+def run_widget(key, prepare, args):
+    """
+    Build one widget and return its JSON body.
+    """
+    started = time.perf_counter()
+    with timed("widget_aggregation", key):
+        work = prepare(*args)
+    if work.body is None:
+        with timed("widget_llm", key):
+            result = complete_widget(work, key)
+    else:
+        result = work.body
+    print(f"{key} response.... {time.perf_counter() - started:.2f}s")
+    return result
+
+
+def build_widget(widget_key, key, prepare, args):
+    """
+    Return a widget from the widget cache, or build it and cache it unless it failed.
+
+    Requests queued behind a shared build find its result here once it is done. The
+    lookup DashboardPlan made is already counted, so this one only peeks.
+    """
+    body = widget_cache.peek(widget_key)
+    if body is None:
+        body = run_widget(key, prepare, args)
+        if isinstance(body, dict) and key in body:
+            widget_cache.put(widget_key, body)
+    return body
 
 
+def iter_widgets(jobs, cache_key=None):
+    """
+    Build the dashboard widgets, concurrently unless WIDGET_EXECUTION is "sequential",
+    and yield each one as soon as it is finished.
 
-def extracter(response_json):
+    Args:
+        jobs (dict): Maps each response key to a (prepare function, args) pair.
+        cache_key (Callable[[str], tuple], optional): Maps a response key to its widget
+            cache key. When given, finished widgets are cached, and a widget already
+            being built under the same key by another request is waited for instead of
+            built again.
+
+    Yields:
+        Tuple[str, dict]: A response key and the widget's JSON body. A widget that raises,
+        or is not finished WIDGET_TIMEOUT_SECONDS after it started running, gets an
+        {"error": ...} body so the other widgets can still be returned. Time spent
+        queued for a widget_executor thread does not count.
+    """
+    # When each widget started running, on the time.monotonic() clock
+    started_at = {}
+
+    def build(key, prepare, args):
+        started_at[key] = time.monotonic()
+        if cache_key is None:
+            return run_widget(key, prepare, args)
+        return widget_flights.do(cache_key(key), build_widget, cache_key(key), key, prepare, args)
+
+    if WIDGET_EXECUTION == "sequential":
+        for key, (prepare, args) in jobs.items():
+            try:
+                body = build(key, prepare, args)
+            except Exception as e:
+                body = {"error": str(e)}
+            yield key, body
+        return
+
+    pending = {
+        widget_executor.submit(build, key, prepare, args): key
+        for key, (prepare, args) in jobs.items()
+    }
     try:
+        while pending:
+            # Wake up when a widget finishes or the first running widget runs out of time
+            deadlines = [started_at[key] + WIDGET_TIMEOUT_SECONDS for key in pending.values() if key in started_at]
+            timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else WIDGET_TIMEOUT_SECONDS
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    body = future.result()
+                except Exception as e:
+                    body = {"error": str(e)}
+                yield key, body
+
+            now = time.monotonic()
+            for future, key in list(pending.items()):
+                if key in started_at and now - started_at[key] >= WIDGET_TIMEOUT_SECONDS:
+                    del pending[future]
+                    yield key, {"error": f"Timed out after {WIDGET_TIMEOUT_SECONDS}s"}
+    finally:
+        # Widgets that timed out, or that a closed stream no longer needs
+        for future in pending:
+            future.cancel()
+
+
+def run_widgets(jobs, cache_key=None):
+    """
+    Build the dashboard widgets with iter_widgets() and wait for all of them.
+
+    Returns:
+        dict: Maps each response key to the widget's JSON body.
+    """
+    return dict(iter_widgets(jobs, cache_key))
+
+
+def widget_section(results, key):
+    """
+    Pick a widget's section out of its JSON body, or describe why it is missing.
+    """
+    body = results.get(key)
+    if isinstance(body, dict) and key in body:
+        return body[key]
+    if isinstance(body, dict) and "error" in body:
+        return {k: v for k, v in body.items() if k in ("error", "details")}
+    return {"error": f"Widget response has no '{key}' section"}
+
+
+def filter_fingerprint(start_date, end_date, loan_type, region, time_period):
+    """
+    Hash the resolved filters that decide what the dashboard widgets show.
+    """
+    filters = [start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), loan_type, region, time_period]
+    return hashlib.sha1(json.dumps(filters).encode()).hexdigest()
+
+
+WIDGET_KEYS = ("barChart", "metrics", "caseStatusForBarchart", "progressStatus", "categoryKeyArr")
+
+
+class DashboardPlan:
+    """
+    Everything extracter() resolves before the widgets are built: the filters, the
+    widgets found in the cache, and the jobs for the ones that are not.
+
+    jobs maps each missing response key to a (prepare function, args) pair. When the
+    filters match no rows, no_records is set and jobs is empty.
+    """
+
+    def __init__(self, response_json):
+        self.response_json = response_json
         start_date_str = response_json.get("startDate", "")
         end_date_str = response_json.get("endDate", "")
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
         end_date = datetime.strptime(end_date_str,"%Y-%m-%d")
         loan_type = response_json.get("loanType", "")
         region = response_json.get("region", "")
-        status = response_json.get("status","")
+        self.status = response_json.get("status","")
         
 
         # # Determine the time period
@@ -781,94 +2536,163 @@ def extracter(response_json):
         # else:
         #     time_period = "Annually"
         time_period = response_json.get("timePeriod", "")
-        dataset = pd.read_csv(r"C:\week3_assignment\Synthetic_Banking_Customer_Dataset_1.csv")
-        # dataset = pd.read_csv(r"C:\Users\chandinip\Downloads\Synthetic_Banking_Customer_Dataset_1 1.csv")
-
-        try:
-            dataset['Approval Date'] = pd.to_datetime(dataset['Approval Date'], format="%d-%m-%Y", errors='coerce')
-        except Exception as e:
-            return {"error": f"Error parsing 'Approval Date': {e}"}
+        self.start_date, self.end_date = start_date, end_date
+        self.loan_type, self.time_period = loan_type, time_period
+        self.snapshot = dataset_store.get()
+
+        # Widgets already built for the same filters on the same dataset come from the cache
+        self.fingerprint = filter_fingerprint(start_date, end_date, loan_type, region, time_period)
+        self.results = {key: widget_cache.get(self.cache_key(key)) for key in WIDGET_KEYS}
+        missing = [key for key, body in self.results.items() if body is None]
+        self.jobs = {}
+        self.no_records = False
+
+        if missing:
+            loan_type_filter = loan_type if loan_type.lower() != "retailloan" else None
+            region_filter = region if region.lower() != "pan india" else None
+
+            # The comparison window runs to the end of its last month, like the selected window
+            start_date_1 = subtract_months(start_date, delta_months)
+            end_date_1 = subtract_months(end_date, delta_months)
+            end_date_1 = end_date_1.replace(day=monthrange(end_date_1.year, end_date_1.month)[1])
+
+            with timed("filter"):
+                filtered_dataset = self.snapshot.select(start_date, end_date, loan_type_filter, region_filter)
+                dataset_1 = self.snapshot.select(start_date_1, end_date_1, loan_type_filter, region_filter)
+
+            if filtered_dataset.empty:
+                self.no_records = True
+                return
+
+            jobs = {
+                "barChart": (prepare_loan_summary, (filtered_dataset,)),
+                "metrics": (prepare_loan_processing, (filtered_dataset, dataset_1)),
+                "caseStatusForBarchart": (prepare_case_status, (filtered_dataset,)),
+                "progressStatus": (prepare_progress_status, (filtered_dataset,)),
+                "categoryKeyArr": (prepare_categories, (filtered_dataset, time_period, loan_type))
+            }
+            self.jobs = {key: jobs[key] for key in missing}
 
-        dataset['Requested Date'] = pd.to_datetime(dataset['Requested Date'], errors='coerce')
-        filtered_dataset = dataset[
-            (dataset['Requested Date'] >= start_date) & (dataset['Requested Date'] <= end_date)
-        ]
+    def no_records_response(self):
+        return {
+            "queryResult": self.response_json,
+            "message": "No records found for the given criteria."
+        }
 
-        start_date_1 = subtract_months(start_date, delta_months)
-        end_date_1 = subtract_months(end_date, delta_months)
+    def header(self):
+        """
+        The fields of the dashboard response that do not come from a widget.
+        """
+        formatted_dates = format_date_range(self.start_date, self.end_date)
+        return {
+            "type": self.loan_type,
+            "subCategory": self.status,
+            "fromDate": formatted_dates[0],
+            "toDate": formatted_dates[1],
+            "timePeriod": self.time_period,
+            "currency": "USD"
+        }
 
-        dataset_1 = dataset[
-            (dataset['Requested Date'] >= start_date_1) & (dataset['Requested Date'] <= end_date_1)
-        ]
+    def cache_key(self, key):
+        return (self.snapshot.version, self.fingerprint, key)
 
-        if loan_type.lower() != "retailloan":
-            filtered_dataset = filtered_dataset[filtered_dataset['Loan Type'].str.contains(loan_type, case=False, na=False)]
-            dataset_1 = dataset_1[dataset_1['Loan Type'].str.contains(loan_type, case=False, na=False)]
+    def response(self, computed):
+        """
+        Assemble the dashboard response from the cached and the freshly built widgets.
 
-        if region.lower() != "pan india":
-            filtered_dataset = filtered_dataset[filtered_dataset['Branch'].str.contains(region, case=False, na=False)]
-            dataset_1 = dataset_1[dataset_1['Branch'].str.contains(loan_type, case=False, na=False)]
+        Args:
+            computed (dict): Maps each key in jobs to the widget's JSON body.
+        """
+        results = dict(self.results, **computed)
 
-        if filtered_dataset.empty:
-            return {
-                "queryResult": response_json,
-                "message": "No records found for the given criteria."
-            }
-        
-        # loan_summary_response = loan_summary(filtered_dataset).get_json()
-        # print("loan_summary_response")
-        # print(" ")
-        # print(loan_summary_response)
-        # case_status_response = case_status(filtered_dataset).get_json()
-        # print("case_status_response")
-        # print(" ")
-        # print(case_status_response)
-        # progress_status_response = progress_status(filtered_dataset).get_json()
-        # print("progress_status_response")
-        # print(" ")
-        # print(progress_status_response)
-        # categories_response = categories(filtered_dataset,time_period,loan_type).get_json()
-        # print("categories_response")
-        # print(" ")
-        # print(categories_response)
-        # loan_processing_response = loan_processing(filtered_dataset, dataset_1).get_json()
-        # print("loan_processing_response")
-        # print(" ")
-        # print(loan_processing_response)
-        print("Started to load....")
-        loan_summary_response = loan_summary(filtered_dataset).get_json()
-        print("loan_summary_response....")
-        case_status_response = case_status(filtered_dataset).get_json()
-        print("case_status_response....")
-        progress_status_response = progress_status(filtered_dataset).get_json()
-        print("progress_status_response....")
-        categories_response = categories(filtered_dataset,time_period,loan_type).get_json()
-        print("categories_response....")
-        loan_processing_response = loan_processing(filtered_dataset, dataset_1).get_json()
-        print("loan_processing_response....")
-
-        formatted_dates = format_date_range(start_date, end_date)
-
-        aggregated_response = {
-            "type": loan_type,
-            "subCategory": status,
-            "fromDate": formatted_dates[0],
-            "toDate": formatted_dates[1],
-            "timePeriod": time_period,
-            "currency": "USD",
-            "barChart": loan_summary_response['barChart'],
-            "metrics": loan_processing_response["metrics"],
-            "caseStatusForBarchart": case_status_response["caseStatusForBarchart"],
-            "progressStatus": progress_status_response["progressStatus"],
-            "categoryKeyArr": categories_response['categoryKeyArr']
-        }
+        aggregated_response = self.header()
+        for key in WIDGET_KEYS:
+            aggregated_response[key] = widget_section(results, key)
 
         return aggregated_response
+
+
+def extracter(response_json, render=None):
+    """
+    Build the dashboard for a structured query.
+
+    Args:
+        response_json (dict): The structured query from api_ask_question().
+        render (Callable[[dict], Any], optional): Turns the response into what is
+            returned, e.g. jsonify. The response_assembly stage covers it, so the
+            serialization cost is part of that stage.
+
+    Returns:
+        The rendered response, or the response dict when render is not given.
+    """
+    render = render or (lambda body: body)
+    try:
+        plan = DashboardPlan(response_json)
+        if plan.no_records:
+            return render(plan.no_records_response())
+
+        computed = {}
+        if plan.jobs:
+            print("Started to load....")
+            computed = run_widgets(plan.jobs, plan.cache_key)
+        with timed("response_assembly"):
+            return render(plan.response(computed))
     except json.JSONDecodeError as e:
-        return {"error": "Invalid JSON format in response", "details": str(e)}
+        return render({"error": "Invalid JSON format in response", "details": str(e)})
     except Exception as e:
-        return {"error while aggregating the response ": str(e)}
-    
+        return render({"error while aggregating the response ": str(e)})
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_dashboard(query_text, category=None, timePeriod=None):
+    """
+    Build the dashboard for a query as a stream of server-sent events, so the UI can
+    draw each part as soon as it exists.
+
+    The events are, in order: "query" with the parsed query, "dashboard" with the
+    response fields that do not come from a widget, then one event per widget named
+    after its response key (barChart, metrics, ...) whose data is {key: section}.
+    Cached widgets come first, the others as they finish. "noRecords" replaces the
+    dashboard and widget events when the filters match no rows, and "error" reports a
+    failure. The stream always ends with "done".
+    """
+    started = time.perf_counter()
+    try:
+        response_json = api_ask_question(query_text, category=category, timePeriod=timePeriod)
+        yield server_sent_event("query", response_json)
+
+        plan = DashboardPlan(response_json)
+        if plan.no_records:
+            yield server_sent_event("noRecords", plan.no_records_response())
+        else:
+            yield server_sent_event("dashboard", plan.header())
+            for key, body in plan.results.items():
+                if body is not None:
+                    yield server_sent_event(key, {key: widget_section(plan.results, key)})
+            for key, body in iter_widgets(plan.jobs, plan.cache_key):
+                yield server_sent_event(key, {key: widget_section({key: body}, key)})
+    except Exception as e:
+        yield server_sent_event("error", {"error": str(e)})
+    yield server_sent_event("done", {"seconds": round(time.perf_counter() - started, 3)})
+
+
+def event_stream(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def stream_request_data():
+    """
+    Read a streaming route's parameters from its JSON body, or from the query string,
+    since a browser EventSource can only send a GET without a body.
+    """
+    return request.get_json(silent=True) or request.args
 
 ##############################################################################################
 
@@ -879,7 +2703,7 @@ def search():
     try:
         response_json = api_ask_question(query_text)
         print(response_json)
-        return jsonify(extracter(response_json))
+        return extracter(response_json, jsonify)
     except json.JSONDecodeError as e:
         return jsonify({"error": "Invalid JSON format in response", "details": str(e)})
     except Exception as e:
@@ -895,7 +2719,7 @@ def category_selected():
 
     try:
         response_json = api_ask_question(query_text, category=catType, timePeriod=None)
-        return jsonify(extracter(response_json))
+        return extracter(response_json, jsonify)
     except json.JSONDecodeError as e:
         return jsonify({"error": "Invalid JSON format in response", "details": str(e)})
     except Exception as e:
@@ -916,14 +2740,132 @@ def time_period_selected():
     try:
         response_timeperiod_json = api_ask_question(query_text, category=None, timePeriod=time_periodType)
         print(response_timeperiod_json)
-        result = extracter(response_timeperiod_json)
-
-       
-        return jsonify(result)
+        return extracter(response_timeperiod_json, jsonify)
     except json.JSONDecodeError as e:
         return jsonify({"error": "Invalid JSON format in response", "details": str(e)})
     except Exception as e:
         return {"timePeriod_error is ": str(e)}
 
+##############################################################################################
+# Streaming variants of the routes above: the same dashboard, sent as server-sent events.
+
+@app.route('/search/stream', methods=['GET', 'POST'])
+def search_stream():
+    data = stream_request_data()
+    return event_stream(stream_dashboard(data.get("query", "")))
+
+
+@app.route('/categorySelected/stream', methods=['GET', 'POST'])
+def category_selected_stream():
+    data = stream_request_data()
+    return event_stream(stream_dashboard(data.get("query", ""), category=data.get("categoryType", "")))
+
+
+@app.route('/time-period-selected/stream', methods=['GET', 'POST'])
+def time_period_selected_stream():
+    data = stream_request_data()
+    return event_stream(stream_dashboard(data.get("query", ""), timePeriod=data.get("timePeriod", "").lower()))
+
+##############################################################################################
+
+def query_parser_stats():
+    counts = query_parse_counts.snapshot()
+    parsed = counts["fastPath"] + counts["llm"]
+    counts["fastPathRatio"] = round(counts["fastPath"] / parsed, 4) if parsed else 0.0
+    return counts
+
+def prompt_token_stats():
+    widgets = {}
+    for name, value in prompt_token_counts.snapshot().items():
+        widget, _, field = name.partition(":")
+        widgets.setdefault(widget, {})[field] = value
+    return widgets
+
+def service_stats():
+    return {
+        "dataset": dataset_store.stats(),
+        "promptTokens": prompt_token_stats(),
+        "queryCache": query_cache.stats(),
+        "queryParser": query_parser_stats(),
+        "singleFlight": {"queryParse": query_flights.stats(), "widgets": widget_flights.stats()},
+        "widgetCache": widget_cache.stats()
+    }
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(service_stats())
+
+##############################################################################################
+
+def counter_lines(name, documentation, label_names, values):
+    """
+    Format counts kept elsewhere (caches, Counters) as one Prometheus counter.
+
+    Args:
+        values (Dict[tuple, int]): Maps each tuple of label values to its count.
+    """
+    return metric_header(name, documentation, "counter") + [
+        f"{name}{metric_labels(label_names, key)} {value}" for key, value in sorted(values.items())
+    ]
+
+def render_metrics():
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in (stage_seconds, request_seconds, llm_requests, llm_tokens):
+        lines += metric.lines()
+
+    prompt_tokens = {(widget,): counts.get("tokens", 0) for widget, counts in prompt_token_stats().items()}
+    lines += counter_lines(
+        "dashboard_prompt_tokens_estimated_total",
+        "Widget prompt tokens counted before sending.",
+        ("widget",), prompt_tokens
+    )
+
+    cache_lookups = {}
+    for cache_name, cache in (("query", query_cache), ("widget", widget_cache)):
+        cache_stats = cache.stats()
+        cache_lookups[(cache_name, "hit")] = cache_stats["hits"]
+        cache_lookups[(cache_name, "miss")] = cache_stats["misses"]
+    lines += counter_lines("dashboard_cache_lookups_total", "Query and widget cache lookups.", ("cache", "result"), cache_lookups)
+
+    lines += counter_lines(
+        "dashboard_query_parses_total", "Queries parsed by the rule-based fast path or the LLM.", ("path",),
+        {(path,): count for path, count in query_parse_counts.snapshot().items()}
+    )
+
+    flights = {}
+    for level, single_flight in (("queryParse", query_flights), ("widgets", widget_flights)):
+        for result, count in single_flight.counts.snapshot().items():
+            flights[(level, result)] = count
+    lines += counter_lines(
+        "dashboard_single_flight_total", "Calls run, and calls coalesced into one already running.",
+        ("level", "result"), flights
+    )
+    lines += counter_lines("dashboard_dataset_loads_total", "Times the dataset was loaded.", (), {(): dataset_store.loads})
+    return "\n".join(lines) + "\n"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response):
+    # Streamed responses are timed until their headers are sent
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_seconds.observe(time.perf_counter() - started, route=route, status=response.status_code)
+    return response
+
 if __name__ == "__main__":     
     app.run(debug=True)
\ No newline at end of file
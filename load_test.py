@@ -0,0 +1,199 @@
+"""
+Load driver for the dashboard routes.
+
+Replays a corpus of dashboard queries against /search, /categorySelected and
+/time-period-selected at a fixed concurrency, then reports throughput, p50/p95/p99
+latency and error rate per route. Run it against either server, backed by
+fake_openai.py so no network is needed:
+
+    python fake_openai.py --latency lognormal:0.2,0.5 &
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8100/ AZURE_OPENAI_API_KEY=fake DASHBOARD_QUERY_FAST_PATH=0 \\
+        DASHBOARD_QUERY_CACHE_SIZE=0 DASHBOARD_WIDGET_CACHE_SIZE=0 DASHBOARD_SINGLE_FLIGHT=0 python final_app.py &
+    python load_test.py --concurrency 32 --requests 500 --output results.json
+
+The cache, fast-path and single-flight settings above make every request reach the
+LLM, including identical requests that arrive together; leave them at their defaults
+to measure the cached and coalesced path instead.
+
+A corpus is a JSON lines file, one request per line:
+
+    {"route": "/search", "query": "housing loans in 2023"}
+    {"route": "/categorySelected", "query": "q3 2023", "categoryType": "goldLoan"}
+    {"route": "/time-period-selected", "query": "2024", "timePeriod": "monthly"}
+"""
+import argparse
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CORPUS = [
+    {"route": "/search", "query": "show all logged-in cases for Q3 2023"},
+    {"route": "/search", "query": "housing loans in 2023"},
+    {"route": "/search", "query": "gold loan cases in Mumbai for Q1 2024"},
+    {"route": "/search", "query": "how did vehicle loans do in 2022"},
+    {"route": "/categorySelected", "query": "show all logged-in cases for Q3 2023", "categoryType": "housingLoan"},
+    {"route": "/categorySelected", "query": "cases in 2023", "categoryType": "goldLoan"},
+    {"route": "/time-period-selected", "query": "show all logged-in cases for Q2 2023", "timePeriod": "monthly"},
+    {"route": "/time-period-selected", "query": "cases in 2023", "timePeriod": "quarterly"},
+]
+
+WIDGET_KEYS = ("barChart", "metrics", "caseStatusForBarchart", "progressStatus", "categoryKeyArr")
+
+
+def load_corpus(path):
+    with open(path) as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def response_error(status, body):
+    """
+    Describe why a dashboard response counts as an error, or return None if it does not.
+    """
+    if status != 200:
+        return f"HTTP {status}"
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return "Response is not JSON"
+    if not isinstance(payload, dict):
+        return "Response is not a JSON object"
+    if any("error" in key for key in payload):
+        return "Request failed"
+    if any(isinstance(payload.get(key), dict) and "error" in payload[key] for key in WIDGET_KEYS):
+        return "Widget failed"
+    return None
+
+
+def send(base_url, entry, timeout):
+    """
+    Send one corpus entry as a GET with a JSON body, like the dashboard does.
+
+    Returns:
+        Tuple[float, Optional[str]]: The latency in seconds and the error, if any.
+    """
+    payload = {key: value for key, value in entry.items() if key != "route"}
+    request = urllib.request.Request(
+        base_url.rstrip("/") + entry["route"],
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="GET"
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, body = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    except Exception as e:
+        return time.perf_counter() - started, type(e).__name__
+    return time.perf_counter() - started, response_error(status, body)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def run_load(base_url, corpus, concurrency, total_requests=None, duration=None, timeout=120):
+    """
+    Replay the corpus round-robin until total_requests are sent or duration seconds pass.
+
+    Returns:
+        Tuple[List[Tuple[str, float, Optional[str]]], float]: (route, latency, error) per
+        request, and the wall-clock seconds the run took.
+    """
+    samples = []
+    lock = threading.Lock()
+    sent = [0]
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                if total_requests is not None and sent[0] >= total_requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                entry = corpus[sent[0] % len(corpus)]
+                sent[0] += 1
+            latency, error = send(base_url, entry, timeout)
+            with lock:
+                samples.append((entry["route"], latency, error))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        workers = [executor.submit(worker) for _ in range(concurrency)]
+        # A worker that crashed would leave the run short of requests; raise its error instead
+        for future in workers:
+            future.result()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """
+    Aggregate the samples per route and over all routes.
+    """
+    routes = sorted({route for route, _, _ in samples}) + ["all"]
+    summary = {}
+    for route in routes:
+        selected = [(latency, error) for r, latency, error in samples if route in ("all", r)]
+        latencies = sorted(latency for latency, _ in selected)
+        errors = [error for _, error in selected if error]
+        summary[route] = {
+            "requests": len(selected),
+            "errors": len(errors),
+            "errorRate": round(len(errors) / len(selected), 4) if selected else 0.0,
+            "throughput": round(len(selected) / elapsed, 2) if elapsed else 0.0,
+            "meanSeconds": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50Seconds": round(percentile(latencies, 0.50), 4),
+            "p95Seconds": round(percentile(latencies, 0.95), 4),
+            "p99Seconds": round(percentile(latencies, 0.99), 4),
+            "errorKinds": {kind: errors.count(kind) for kind in sorted(set(errors))}
+        }
+    return summary
+
+
+def print_summary(summary, elapsed):
+    print(f"{'route':<24}{'reqs':>7}{'err%':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for route, row in summary.items():
+        print(
+            f"{route:<24}{row['requests']:>7}{row['errorRate'] * 100:>7.1f}%{row['throughput']:>9.2f}"
+            f"{row['p50Seconds']:>9.3f}{row['p95Seconds']:>9.3f}{row['p99Seconds']:>9.3f}"
+        )
+    print(f"Finished in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the dashboard routes.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--corpus", help="JSON lines file of requests; a built-in corpus is used by default")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=None, help="Total requests to send (default 200 unless --duration is set)")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to keep sending requests")
+    parser.add_argument("--routes", help="Comma-separated routes to keep from the corpus")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    if args.routes:
+        corpus = [entry for entry in corpus if entry["route"] in args.routes.split(",")]
+    total_requests = args.requests if args.requests is not None or args.duration else 200
+
+    samples, elapsed = run_load(args.base_url, corpus, args.concurrency, total_requests, args.duration, args.timeout)
+    summary = summarize(samples, elapsed)
+    print_summary(summary, elapsed)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "baseUrl": args.base_url,
+                "concurrency": args.concurrency,
+                "elapsedSeconds": round(elapsed, 3),
+                "routes": summary
+            }, output_file, indent=2)
@@ -0,0 +1,41 @@
+"""
+Tests for DatasetAlter's incremental labelling.
+"""
+import numpy as np
+import pandas as pd
+
+from DatasetAlter import alter_dataset, alter_incremental
+from DatasetCreator import generate_dataset, write_chunks
+
+BATCHES = 200
+BATCH_ROWS = 9
+
+
+def label_shares(path):
+    labelled = pd.read_csv(path)
+    return {
+        "Cancelled": (labelled["LoanStatus"] == "Cancelled").mean(),
+        "Documents Missing": (labelled["Reason"] == "Documents Missing").mean()
+    }
+
+
+def test_small_appends_keep_the_label_shares(tmp_path):
+    raw_path = tmp_path / "raw.csv"
+    write_chunks([generate_dataset(BATCHES * BATCH_ROWS, np.random.default_rng(3))], str(raw_path))
+    header, *rows = raw_path.read_text(encoding="utf-8").splitlines(keepends=True)
+
+    input_path, output_path = tmp_path / "input.csv", tmp_path / "labelled.csv"
+    input_path.write_text(header, encoding="utf-8")
+    for batch in range(BATCHES):
+        with open(input_path, "a", encoding="utf-8") as input_file:
+            input_file.writelines(rows[batch * BATCH_ROWS:(batch + 1) * BATCH_ROWS])
+        assert alter_incremental(str(input_path), str(output_path), seed=11) == BATCH_ROWS
+
+    whole_path = tmp_path / "whole.csv"
+    alter_dataset(str(raw_path), str(whole_path), seed=11)
+
+    incremental, whole = label_shares(output_path), label_shares(whole_path)
+    assert len(pd.read_csv(output_path)) == BATCHES * BATCH_ROWS
+    for label in incremental:
+        assert incremental[label] > 0.03
+        assert abs(incremental[label] - whole[label]) < 0.04, (label, incremental[label], whole[label])
@@ -0,0 +1,39 @@
+"""
+End-to-end tests for the DatasetCreator.py command line.
+"""
+import os
+import random
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import DatasetCreator
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DatasetCreator.py")
+
+
+def run_script(*args):
+    subprocess.run([sys.executable, SCRIPT, *args], check=True, capture_output=True, text=True)
+
+
+def test_default_loop_mode_writes_csv(tmp_path):
+    output = tmp_path / "dataset.csv"
+    run_script("--rows", "300", "--seed", "5", "--output", str(output))
+
+    # The loop mode's frame mixes numbers with "N/A" in object columns
+    random.seed(5)
+    expected = DatasetCreator.generate_dataset_loop(300)
+    assert DatasetCreator.mixed_columns(expected)
+    assert output.read_text(encoding="utf-8") == expected.to_csv(index=False, date_format='%Y-%m-%d')
+
+
+@pytest.mark.skipif(DatasetCreator.pq is None, reason="parquet needs pyarrow")
+def test_default_loop_mode_writes_parquet(tmp_path):
+    output = tmp_path / "dataset.parquet"
+    run_script("--rows", "300", "--seed", "5", "--output", str(output), "--format", "parquet")
+
+    dataset = pd.read_parquet(output)
+    assert len(dataset) == 300
+    assert "N/A" in set(dataset["Asset Value"])
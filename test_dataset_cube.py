@@ -0,0 +1,118 @@
+"""
+Parity tests for the monthly dataset cube: the dashboard must come out the same whether
+the widgets aggregate the cube or the raw rows.
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import final_app
+
+
+def window(start_date, end_date, time_period, loan_type="retailLoan", region="Pan India"):
+    return {
+        "startDate": start_date,
+        "endDate": end_date,
+        "region": region,
+        "loanType": loan_type,
+        "queryType": "logged-in cases",
+        "status": "allcategories" if loan_type == "retailLoan" else loan_type,
+        "timePeriod": time_period
+    }
+
+
+WINDOWS = {
+    "whole_month": window("2023-03-01", "2023-03-31", "monthly"),
+    "whole_quarter": window("2023-04-01", "2023-06-30", "quarterly"),
+    "whole_year": window("2023-01-01", "2023-12-31", "annually"),
+    "partial_month": window("2023-03-05", "2023-04-20", "monthly"),
+    "partial_year": window("2022-02-10", "2023-01-31", "annually"),
+    "loan_type": window("2023-01-01", "2023-03-31", "quarterly", loan_type="Housing Loan"),
+    "region": window("2022-07-01", "2022-09-30", "quarterly", region="Mumbai"),
+    "loan_type_and_region": window("2023-01-01", "2023-12-31", "annually", loan_type="Gold Loan", region="Pune"),
+    "two_years": window("2022-01-01", "2023-12-31", "annually"),
+    "three_years": window("2022-01-01", "2024-12-31", "annually"),
+    "two_years_filtered": window("2022-04-01", "2024-03-31", "annually", loan_type="Vehicle Loan", region="Bengaluru"),
+    "first_month": window("2022-01-01", "2022-01-31", "monthly"),
+    "last_month": window("2024-12-01", "2024-12-31", "monthly"),
+    "before_the_start": window("2021-07-01", "2022-06-30", "annually"),
+    "past_the_end": window("2024-07-01", "2025-06-30", "annually"),
+    "empty_dates": window("2019-01-01", "2019-01-31", "monthly"),
+    "empty_region": window("2023-01-01", "2023-03-31", "quarterly", region="Atlantis")
+}
+
+
+@pytest.mark.parametrize("name", WINDOWS)
+def test_dashboard_matches_raw_rows(dashboard, name):
+    with_cube = dashboard(WINDOWS[name], use_cube=True)
+    without_cube = dashboard(WINDOWS[name], use_cube=False)
+    assert with_cube == without_cube
+    assert not any(key.startswith("error") for key in with_cube)
+    if "message" not in with_cube:
+        for key in final_app.WIDGET_KEYS:
+            assert "error" not in with_cube[key], (key, with_cube[key])
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("whole_month", True),
+    ("whole_year", True),
+    ("loan_type_and_region", True),
+    ("partial_month", False),
+    ("partial_year", False)
+])
+def test_cube_answers_whole_months_only(dashboard, name, expected):
+    dashboard(WINDOWS[name], use_cube=True)
+    snapshot = final_app.dataset_store.get()
+    response_json = WINDOWS[name]
+    selection = snapshot.select(
+        datetime.strptime(response_json["startDate"], "%Y-%m-%d"),
+        datetime.strptime(response_json["endDate"], "%Y-%m-%d")
+    )
+    assert isinstance(selection, final_app.CubeSlice) == expected
+
+
+@pytest.mark.parametrize("name", ["empty_dates", "empty_region"])
+def test_empty_windows_have_no_records(dashboard, name):
+    assert dashboard(WINDOWS[name], use_cube=True)["message"] == "No records found for the given criteria."
+
+
+# Windows answered by loan_processing and case_status, plus the comparison windows
+# loan_processing reads before them
+PREFIX_SUM_WINDOWS = [
+    ("2023-03-01", "2023-03-31", None, None),
+    ("2022-01-01", "2024-12-31", None, None),
+    ("2019-01-01", "2021-12-31", None, None),
+    ("2021-07-01", "2022-06-30", None, None),
+    ("2024-07-01", "2025-06-30", None, None),
+    ("2022-01-01", "2022-01-31", "Housing Loan", None),
+    ("2024-12-01", "2024-12-31", None, "Mumbai"),
+    ("2022-04-01", "2024-03-31", "Vehicle Loan", "Bengaluru"),
+    ("2023-01-01", "2023-12-31", "Gold Loan", "Atlantis")
+]
+
+
+@pytest.mark.parametrize("column", final_app.PREFIX_SUM_COLUMNS)
+@pytest.mark.parametrize("start_date, end_date, loan_type, region", PREFIX_SUM_WINDOWS)
+def test_prefix_sums_match_raw_groupby(dashboard, column, start_date, end_date, loan_type, region):
+    dashboard(WINDOWS["whole_month"], use_cube=True)
+    snapshot = final_app.dataset_store.get()
+    start, end = datetime.strptime(start_date, "%Y-%m-%d"), datetime.strptime(end_date, "%Y-%m-%d")
+
+    selection = snapshot.select(start, end, loan_type, region)
+    assert isinstance(selection, final_app.CubeSlice)
+    from_prefix_sums = selection.cube.prefix_sums[column].aggregate(
+        start, end, selection.loan_codes, selection.branch_codes
+    )
+
+    aggregations = {"Customer ID": "count"}
+    aggregations.update({col: "sum" for col in final_app.CUBE_MEASURES})
+    rows = snapshot.select_rows(start, end, loan_type, region)
+    from_rows = rows.groupby(column, observed=True).agg(aggregations).reset_index()
+    from_rows[column] = from_rows[column].astype(str)
+
+    assert from_prefix_sums[column].tolist() == from_rows[column].tolist()
+    assert from_prefix_sums["Customer ID"].dtype == np.int64
+    assert from_prefix_sums["Customer ID"].tolist() == from_rows["Customer ID"].tolist()
+    for col in final_app.CUBE_MEASURES:
+        assert from_prefix_sums[col].to_numpy() == pytest.approx(from_rows[col].to_numpy())
@@ -0,0 +1,41 @@
+"""
+Tests for the per-widget timeout of final_app.iter_widgets.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import final_app
+from final_app import WidgetWork
+
+
+def sleeping_widget(seconds):
+    def prepare():
+        time.sleep(seconds)
+        return WidgetWork(body={"slept": seconds})
+    return prepare
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(final_app, "widget_executor", executor)
+    monkeypatch.setattr(final_app, "WIDGET_EXECUTION", "concurrent")
+    monkeypatch.setattr(final_app, "WIDGET_TIMEOUT_SECONDS", 0.5)
+    yield
+    executor.shutdown(wait=True)
+
+
+def test_time_queued_does_not_count(one_worker):
+    # Run one at a time, the last widget starts 0.6s after submission but runs for 0.3s
+    jobs = {key: (sleeping_widget(0.3), ()) for key in ("a", "b", "c")}
+    assert final_app.run_widgets(jobs) == {key: {"slept": 0.3} for key in jobs}
+
+
+def test_running_widget_times_out(one_worker):
+    jobs = {"fast": (sleeping_widget(0.1), ()), "slow": (sleeping_widget(1.5), ())}
+    started = time.monotonic()
+    results = final_app.run_widgets(jobs)
+    assert time.monotonic() - started < 1.0
+    assert results == {"fast": {"slept": 0.1}, "slow": {"error": "Timed out after 0.5s"}}
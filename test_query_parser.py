@@ -0,0 +1,165 @@
+"""
+Table-driven tests for final_app.parse_query_locally, the rule-based query parser that
+decides which dashboard queries skip the LLM.
+"""
+from datetime import datetime
+
+import pytest
+
+import final_app
+
+
+TODAY = datetime(2024, 5, 15)
+CITIES = {"Mumbai", "Pune", "Bengaluru"}
+
+
+@pytest.fixture(autouse=True)
+def branch_cities(monkeypatch):
+    monkeypatch.setattr(final_app, "known_cities", lambda: CITIES)
+
+
+def parsed(query_text, category=None, timePeriod=None, today=TODAY):
+    return final_app.parse_query_locally(query_text, category, timePeriod, today)
+
+
+def dates(result):
+    return result["startDate"], result["endDate"], result["timePeriod"]
+
+
+@pytest.mark.parametrize("query_text, today, expected", [
+    ("show loans this month", TODAY, ("2024-05-01", "2024-05-31", "monthly")),
+    ("current month", TODAY, ("2024-05-01", "2024-05-31", "monthly")),
+    ("last month", TODAY, ("2024-04-01", "2024-04-30", "monthly")),
+    ("previous month", datetime(2024, 1, 10), ("2023-12-01", "2023-12-31", "monthly")),
+    ("this quarter", TODAY, ("2024-04-01", "2024-06-30", "quarterly")),
+    ("last quarter", TODAY, ("2024-01-01", "2024-03-31", "quarterly")),
+    ("last quarter", datetime(2024, 2, 10), ("2023-10-01", "2023-12-31", "quarterly")),
+    ("this year", TODAY, ("2024-01-01", "2024-12-31", "annually")),
+    ("last year", TODAY, ("2023-01-01", "2023-12-31", "annually")),
+    ("loans", TODAY, ("2024-05-01", "2024-05-31", "monthly")),
+])
+def test_relative_periods(query_text, today, expected):
+    assert dates(parsed(query_text, today=today)) == expected
+
+
+@pytest.mark.parametrize("query_text, expected", [
+    ("march 2023", ("2023-03-01", "2023-03-31", "monthly")),
+    ("loans for sept 2022", ("2022-09-01", "2022-09-30", "monthly")),
+    ("feb-2024", ("2024-02-01", "2024-02-29", "monthly")),
+    ("q2 2023", ("2023-04-01", "2023-06-30", "quarterly")),
+    ("q4", ("2024-10-01", "2024-12-31", "quarterly")),
+    ("2023-q3", ("2023-07-01", "2023-09-30", "quarterly")),
+    ("second quarter of 2022", ("2022-04-01", "2022-06-30", "quarterly")),
+    ("loans in 2022", ("2022-01-01", "2022-12-31", "annually")),
+    ("jan 2023 to mar 2023", ("2023-01-01", "2023-03-31", "quarterly")),
+    ("from nov 2022 till oct 2023", ("2022-11-01", "2023-10-31", "annually")),
+])
+def test_explicit_dates(query_text, expected):
+    assert dates(parsed(query_text)) == expected
+
+
+@pytest.mark.parametrize("query_text, timePeriod, expected", [
+    ("march 2023", "monthly", ("2023-03-01", "2023-03-31", "monthly")),
+    ("march 2023", "quarterly", ("2023-01-01", "2023-03-31", "quarterly")),
+    ("march 2023", "annually", ("2023-01-01", "2023-12-31", "annually")),
+    ("2023", "quarterly", ("2023-01-01", "2023-03-31", "quarterly")),
+    ("q3 2023", "monthly", ("2023-07-01", "2023-07-31", "monthly")),
+])
+def test_time_period_adjustment(query_text, timePeriod, expected):
+    assert dates(parsed(query_text, timePeriod=timePeriod)) == expected
+
+
+@pytest.mark.parametrize("query_text, timePeriod", [
+    ("jan 2023 to feb 2023", None),
+    ("jan 2023 to mar 2023", "monthly"),
+    ("mar 2023 to jan 2023", None),
+    ("last 7 days", None),
+    ("loans since march", None),
+    ("march 2023 and 2024", None),
+    ("q1 2023 vs q2 2023", None),
+    ("loans in 1850", None),
+    ("ytd approvals", None),
+])
+def test_unsupported_dates_go_to_the_llm(query_text, timePeriod):
+    assert parsed(query_text, timePeriod=timePeriod) is None
+
+
+@pytest.mark.parametrize("query_text, loan_type, status", [
+    ("home loans", "Housing Loan", "housingLoan"),
+    ("housing loans", "Housing Loan", "housingLoan"),
+    ("car loans", "Vehicle Loan", "vehicleLoan"),
+    ("two-wheeler loans", "Vehicle Loan", "vehicleLoan"),
+    ("loan against property", "Loan Against Property", "loanAgainstProperty"),
+    ("gold loans", "Gold Loan", "goldLoan"),
+    ("education loans", "Education Loan", "educationalLoan"),
+    ("student loans", "Education Loan", "educationalLoan"),
+    ("personal loans", "Personal Loan", "personalLoan"),
+    ("business loans", "Business Loan", "businessLoan"),
+    ("approved loans", "retailLoan", "allcategories"),
+])
+def test_loan_types(query_text, loan_type, status):
+    result = parsed(query_text)
+    assert (result["loanType"], result["status"]) == (loan_type, status)
+
+
+def test_loan_pattern_table_is_covered():
+    covered = {"Housing Loan", "Vehicle Loan", "Loan Against Property", "Gold Loan",
+               "Education Loan", "Personal Loan", "Business Loan"}
+    assert {loan_type for _, loan_type, _ in final_app.QUERY_LOAN_TYPES} == covered
+
+
+@pytest.mark.parametrize("category, loan_type, status", [
+    ("Gold Loan", "Gold Loan", "Gold Loan"),
+    ("All Categories", "retailLoan", "allcategories"),
+])
+def test_category_overrides_query(category, loan_type, status):
+    result = parsed("home loans", category=category)
+    assert (result["loanType"], result["status"]) == (loan_type, status)
+
+
+@pytest.mark.parametrize("query_text", [
+    "home and car loans",
+    "gold loans vs personal loans",
+    "business and education loans last month",
+    "crypto loans",
+])
+def test_ambiguous_loan_types_go_to_the_llm(query_text):
+    assert parsed(query_text) is None
+
+
+@pytest.mark.parametrize("query_text, region", [
+    ("home loans in mumbai", "Mumbai"),
+    ("bengaluru last quarter", "Bengaluru"),
+    ("loans", "Pan India"),
+    ("loans across all branches", "Pan India"),
+    ("pan india loans", "Pan India"),
+    ("pan-india", "Pan India"),
+])
+def test_regions(query_text, region):
+    assert parsed(query_text)["region"] == region
+
+
+@pytest.mark.parametrize("query_text", [
+    "loans in mumbai and pune",
+    "loans by branch",
+    "top regions",
+])
+def test_ambiguous_regions_go_to_the_llm(query_text):
+    assert parsed(query_text) is None
+
+
+def test_unknown_cities_go_to_the_llm(monkeypatch):
+    monkeypatch.setattr(final_app, "known_cities", lambda: None)
+    assert parsed("home loans") is None
+
+
+def test_response_format():
+    assert parsed("gold loans in pune last month") == {
+        "startDate": "2024-04-01",
+        "endDate": "2024-04-30",
+        "region": "Pune",
+        "loanType": "Gold Loan",
+        "queryType": "logged-in cases",
+        "status": "goldLoan",
+        "timePeriod": "monthly"
+    }
@@ -0,0 +1,31 @@
+"""
+Tests that every widget lookup is counted once in the widget cache statistics.
+"""
+import final_app
+
+WINDOW = {
+    "startDate": "2023-04-01",
+    "endDate": "2023-06-30",
+    "region": "Pan India",
+    "loanType": "retailLoan",
+    "queryType": "logged-in cases",
+    "status": "allcategories",
+    "timePeriod": "quarterly"
+}
+
+
+def test_cold_then_warm_dashboard_counts_each_lookup_once(dashboard):
+    widgets = len(final_app.WIDGET_KEYS)
+
+    cold = dashboard(WINDOW, use_cube=True)
+    stats = final_app.widget_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (0, widgets, widgets)
+
+    warm = final_app.extracter(WINDOW)
+    assert warm == cold
+    stats = final_app.widget_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hitRatio"]) == (widgets, widgets, 0.5)
+
+    metrics = final_app.render_metrics()
+    assert f'dashboard_cache_lookups_total{{cache="widget",result="hit"}} {widgets}' in metrics
+    assert f'dashboard_cache_lookups_total{{cache="widget",result="miss"}} {widgets}' in metrics